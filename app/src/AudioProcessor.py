@@ -3,75 +3,148 @@ import glob
 import time
 from tqdm import tqdm
 import torch
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import DataLoader, Dataset, Sampler
 import soundfile as sf
 import jiwer
+from .audio_cache import open_audio_cache
+
+
+class LengthBucketBatchSampler(Sampler):
+    """Groups files of similar duration into batches under a total-audio-seconds budget.
+
+    A batch costs ``len(batch) * longest_duration`` seconds once padded, so files are
+    bucketed by duration and each bucket is cut into batches whose padded cost stays
+    under ``max_batch_seconds``.
+    """
+
+    def __init__(self, durations, max_batch_seconds=600.0, bucket_width=2.0, max_batch_size=None):
+        self.durations = durations
+        self.max_batch_seconds = max_batch_seconds
+        self.bucket_width = bucket_width
+        self.max_batch_size = max_batch_size
+        self.batches = self._build_batches()
+
+    def _build_batches(self):
+        buckets = {}
+        for idx, duration in enumerate(self.durations):
+            buckets.setdefault(int(duration // self.bucket_width), []).append(idx)
+
+        batches = []
+        for key in sorted(buckets):
+            batch = []
+            longest = 0.0
+            for idx in sorted(buckets[key], key=lambda i: self.durations[i]):
+                new_longest = max(longest, self.durations[idx])
+                too_long = batch and new_longest * (len(batch) + 1) > self.max_batch_seconds
+                too_many = self.max_batch_size and len(batch) >= self.max_batch_size
+                if too_long or too_many:
+                    batches.append(batch)
+                    batch, new_longest = [], self.durations[idx]
+                batch.append(idx)
+                longest = new_longest
+            if batch:
+                batches.append(batch)
+        return batches
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+
+def read_durations(audio_files, cache=None):
+    """Read durations from the audio cache index or file headers, without decoding the audio."""
+    durations = []
+    for audio_file in audio_files:
+        if cache is not None and audio_file in cache:
+            durations.append(cache.duration(audio_file))
+            continue
+        info = sf.info(audio_file)
+        durations.append(info.frames / info.samplerate)
+    return durations
+
+
+def collate_batch(batch):
+    return batch
+
 
 class AudioProcessor:
-    def __init__(self, model, batch_size=8, eval_mode=False):
+    def __init__(self, model, batch_size=None, eval_mode=False, max_batch_seconds=600.0, bucket_width=2.0,
+                 audio_cache=None):
         self.model = model
+        self.audio_cache = open_audio_cache(audio_cache)  # see tools/build_audio_cache.py
         self.batch_size = batch_size
         self.eval_mode = eval_mode
+        self.max_batch_seconds = max_batch_seconds
+        self.bucket_width = bucket_width
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.model.to(self.device)
         self.model.eval()
 
     class AudioDataset(Dataset):
-        def __init__(self, audio_files, ground_truths=None):
+        def __init__(self, audio_files, ground_truths=None, cache=None):
             self.audio_files = audio_files
             self.ground_truths = ground_truths
+            self.cache = cache
 
         def __len__(self):
             return len(self.audio_files)
 
         def __getitem__(self, idx):
-            with open(self.audio_files[idx], 'rb') as f:
-                audio_data = f.read()
+            if self.cache is not None:
+                audio_data = self.cache.load(self.audio_files[idx])
+            else:
+                audio_data, _ = sf.read(self.audio_files[idx], dtype='float32')
             if self.ground_truths:
-                return audio_data, self.ground_truths[idx]
-            return audio_data
+                return idx, audio_data, self.ground_truths[idx]
+            return idx, audio_data
 
-    def batch_transcribe(self, batch):
-        with torch.no_grad(), torch.cuda.amp.autocast():
-            if self.eval_mode:
-                audios = [item[0] for item in batch]
-            else:
-                audios = batch
-            transcriptions = self.model.transcribe(audios)
+    def batch_transcribe(self, audios):
+        # Precision (fp16/bf16/int8) is applied once by the backend, see `precision` in config.yml
+        with torch.no_grad():
+            transcriptions = self.model.transcribe(audios, batch_size=len(audios))
         return transcriptions
 
     def process_files(self, root_dir):
-        audio_files = glob.glob(os.path.join(root_dir, '**', '*.flac'), recursive=True)
-        
         if self.eval_mode:
-            ground_truths = self._load_ground_truths(root_dir)
-            dataset = self.AudioDataset(audio_files, ground_truths)
+            # The persisted utterance index holds paths, references and durations; imported here
+            # because src.evaluation builds on this module's sampler and collate function
+            from .evaluation import build_index
+            entries = build_index(root_dir)
+            audio_files = [entry['path'] for entry in entries]
+            dataset = self.AudioDataset(audio_files, [entry['reference'] for entry in entries], self.audio_cache)
+            durations = [entry['duration'] for entry in entries]
         else:
-            dataset = self.AudioDataset(audio_files)
-
-        dataloader = DataLoader(dataset, batch_size=self.batch_size, num_workers=4)
-
-        total_audio_duration = 0
+            audio_files = glob.glob(os.path.join(root_dir, '**', '*.flac'), recursive=True)
+            dataset = self.AudioDataset(audio_files, cache=self.audio_cache)
+            # Durations come from the file headers once, then drive both batching and metrics
+            durations = read_durations(audio_files, self.audio_cache)
+        sampler = LengthBucketBatchSampler(durations, max_batch_seconds=self.max_batch_seconds,
+                                           bucket_width=self.bucket_width, max_batch_size=self.batch_size)
+        dataloader = DataLoader(dataset, batch_sampler=sampler, collate_fn=collate_batch, num_workers=4)
+
+        total_audio_duration = sum(durations)
         total_processing_time = 0
-        all_transcriptions = []
-        all_ground_truths = []
+        all_transcriptions = [None] * len(audio_files)
+        all_ground_truths = [None] * len(audio_files)
 
         start_time = time.time()
 
         for batch in tqdm(dataloader):
+            indices = [item[0] for item in batch]
+            audios = [item[1] for item in batch]
+
             batch_start_time = time.time()
-            if self.eval_mode:
-                audios, truths = batch
-                transcriptions = self.batch_transcribe(audios)
-                all_ground_truths.extend(truths)
-            else:
-                transcriptions = self.batch_transcribe(batch)
+            transcriptions = self.batch_transcribe(audios)
             batch_end_time = time.time()
 
-            all_transcriptions.extend(transcriptions)
-            
-            batch_duration = sum([sf.info(audio_file).duration for audio_file in (audios if self.eval_mode else batch)])
-            total_audio_duration += batch_duration
+            # Put results back in input file order
+            for i, idx in enumerate(indices):
+                all_transcriptions[idx] = transcriptions[i]
+                if self.eval_mode:
+                    all_ground_truths[idx] = batch[i][2]
+
             total_processing_time += batch_end_time - batch_start_time
 
         end_time = time.time()
@@ -85,17 +158,6 @@ class AudioProcessor:
 
         return all_transcriptions
 
-    def _load_ground_truths(self, root_dir):
-        ground_truths = {}
-        for trans_file in glob.glob(os.path.join(root_dir, '**', '*.trans.txt'), recursive=True):
-            with open(trans_file, 'r') as f:
-                for line in f:
-                    parts = line.strip().split(maxsplit=1)
-                    if len(parts) == 2:
-                        file_id, text = parts
-                        ground_truths[file_id] = text.lower()
-        return ground_truths
-
     def _print_metrics(self, total_time, total_audio_duration, total_processing_time, num_files):
         rtf = total_processing_time / total_audio_duration
         throughput = num_files / total_time
@@ -0,0 +1,129 @@
+import os
+import json
+import logging
+import multiprocessing as mp
+from typing import Dict, Iterable
+
+import numpy as np
+import soundfile as sf
+
+from .preprocess import TARGET_SAMPLE_RATE, convert_audio, init_worker
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+DTYPES = ("float32", "int16")
+
+
+def cache_key(path: str) -> str:
+    """Files are looked up by name without extension, e.g. 1089-134686-0000 (LibriSpeech ids are unique)."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def default_cache_dir(root_dir: str) -> str:
+    """Next to the dataset, e.g. LibriSpeech/test-clean.audio_cache."""
+    return os.path.normpath(root_dir) + ".audio_cache"
+
+
+def _decode_file(path):
+    with open(path, "rb") as f:
+        samples, _, _ = convert_audio(f.read())
+    return path, samples
+
+
+def build_audio_cache(audio_files: Iterable[str], cache_dir: str, dtype: str = "float32",
+                      shard_mb: int = 1024, workers: int = None) -> Dict:
+    """Decode every file once to 16 kHz mono and append it to contiguous raw shards.
+
+    Each shard is a flat little-endian ``dtype`` array (int16 halves disk and page-cache use at
+    the cost of a float conversion on read); ``index.json`` maps every file to its shard,
+    sample offset and length. Files decode in a process pool and are written in order.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}, got {dtype}")
+    os.makedirs(cache_dir, exist_ok=True)
+    audio_files = list(audio_files)
+    shard_samples = shard_mb * 1024 * 1024 // np.dtype(dtype).itemsize
+
+    shards, entries = [], {}
+    shard_file, shard_fill = None, 0
+    with mp.Pool(workers, initializer=init_worker) as pool:
+        for path, samples in pool.imap(_decode_file, audio_files, chunksize=8):
+            if shard_file is None or (shard_fill and shard_fill + len(samples) > shard_samples):
+                if shard_file is not None:
+                    shard_file.close()
+                shards.append(f"shard-{len(shards):05d}.bin")
+                shard_file = open(os.path.join(cache_dir, shards[-1]), "wb")
+                shard_fill = 0
+            if dtype == "int16":
+                samples = (np.clip(samples, -1.0, 32767 / 32768) * 32768).astype("<i2")
+            shard_file.write(np.ascontiguousarray(samples, dtype=np.dtype(dtype).newbyteorder("<")).tobytes())
+            entries[cache_key(path)] = {"path": os.path.abspath(path), "shard": len(shards) - 1,
+                                        "offset": shard_fill, "length": len(samples)}
+            shard_fill += len(samples)
+    if shard_file is not None:
+        shard_file.close()
+
+    index = {"dtype": dtype, "sample_rate": TARGET_SAMPLE_RATE, "shards": shards, "entries": entries}
+    with open(os.path.join(cache_dir, INDEX_FILE), "w") as f:
+        json.dump(index, f)
+    logger.info(f"Cached {len(entries)} files into {len(shards)} shards in {cache_dir}")
+    return index
+
+
+class AudioCache:
+    """Read-only view of a cache written by build_audio_cache.
+
+    Shards are opened with ``np.memmap`` on first use, so a float32 lookup is a slice of the
+    mapping: no decode and no copy, and processes reading the same cache (DataLoader workers,
+    shard processes) share its pages through the OS page cache. The mappings are not pickled;
+    each process reopens them.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        with open(os.path.join(cache_dir, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        self.dtype = np.dtype(index["dtype"]).newbyteorder("<")
+        self.sample_rate = index["sample_rate"]
+        self.shards = index["shards"]
+        self.entries = index["entries"]
+        self._maps = {}
+
+    def __getstate__(self):
+        return {**self.__dict__, "_maps": {}}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path_or_key: str) -> bool:
+        return cache_key(path_or_key) in self.entries
+
+    def _shard(self, shard: int) -> np.memmap:
+        if shard not in self._maps:
+            self._maps[shard] = np.memmap(os.path.join(self.cache_dir, self.shards[shard]), dtype=self.dtype, mode="r")
+        return self._maps[shard]
+
+    def __getitem__(self, path_or_key: str) -> np.ndarray:
+        """Samples of one file: a read-only view for float32 caches, a float32 copy for int16 ones."""
+        entry = self.entries[cache_key(path_or_key)]
+        samples = self._shard(entry["shard"])[entry["offset"]:entry["offset"] + entry["length"]]
+        if self.dtype.kind == "i":
+            return samples * np.float32(1 / 32768)
+        return samples
+
+    def duration(self, path_or_key: str) -> float:
+        return self.entries[cache_key(path_or_key)]["length"] / self.sample_rate
+
+    def load(self, path: str) -> np.ndarray:
+        """Cached samples if the file is in the cache, otherwise decode it from disk."""
+        if path in self:
+            return self[path]
+        samples, _ = sf.read(path, dtype="float32")
+        return samples
+
+
+def open_audio_cache(cache_dir: str = None):
+    """AudioCache for ``cache_dir``, or None when no cache is given."""
+    return AudioCache(cache_dir) if cache_dir else None
+
@@ -0,0 +1,371 @@
+import time
+import logging
+from contextlib import nullcontext
+from typing import List, Sequence
+
+import numpy as np
+import torch
+
+from .config import config
+from .decoding import greedy_decode
+
+logger = logging.getLogger(__name__)
+
+
+class ASRBackend:
+    """What the serving path needs from a CTC model.
+
+    ``forward`` takes a padded batch of 16 kHz float32 audio and returns
+    ``(log_probs, encoded_len, greedy_predictions)`` like NeMo's ``EncDecCTCModel.forward``.
+    ``frame_shift`` is the number of input samples per output frame.
+    """
+
+    sample_rate = 16000
+    frame_shift = 1280
+    blank_id = 0
+    device = torch.device("cpu")
+    precision = "fp32"
+    autocast_dtype = None
+    encoder_configurable = False
+
+    def precision_modules(self) -> List[torch.nn.Module]:
+        """Modules that precision modes cast or quantize; feature extraction stays fp32."""
+        return []
+
+    def apply_precision(self, precision: str):
+        """Switch to fp32 / fp16 / bf16 / int8-dynamic once, at load time.
+
+        fp16/bf16 cast the weights once and run forward under autocast so the fp32 features
+        are cast on the way in. int8-dynamic quantizes Linear layers (the conformer's
+        feed-forward and attention projections) and is CPU-only.
+        """
+        if precision == "fp32":
+            pass
+        elif precision in ("fp16", "bf16"):
+            dtype = torch.float16 if precision == "fp16" else torch.bfloat16
+            if dtype == torch.float16 and self.device.type != "cuda":
+                raise ValueError("fp16 needs CUDA; use bf16 or int8-dynamic on CPU")
+            for module in self.precision_modules():
+                module.to(dtype)
+            self.autocast_dtype = dtype
+        elif precision == "int8-dynamic":
+            if self.device.type != "cpu":
+                raise ValueError("int8-dynamic quantization only runs on CPU")
+            for module in self.precision_modules():
+                torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        else:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.precision = precision
+        logger.info(f"Precision: {precision}")
+
+    def configure_encoder(self, attention_context: Sequence[int], subsampling_factor: int):
+        """Local attention span [left, right] in frames and subsampling conv chunking (1 = auto).
+
+        Only backends with ``encoder_configurable`` act on it; exported or toy models keep the
+        encoder they were built with.
+        """
+
+    def autocast(self):
+        if self.autocast_dtype is None:
+            return nullcontext()
+        return torch.autocast(self.device.type, dtype=self.autocast_dtype)
+
+    def forward(self, input_signal: torch.Tensor, input_signal_length: torch.Tensor):
+        raise NotImplementedError
+
+    def ids_to_text(self, ids: Sequence[int]) -> str:
+        raise NotImplementedError
+
+    def ids_to_pieces(self, ids: Sequence[int]) -> List[str]:
+        """Vocabulary pieces for word timestamps (SentencePiece ``▁`` or a space token starts a word)."""
+        return [self.ids_to_text([i]) for i in ids]
+
+    def transcribe(self, audios: List[np.ndarray], batch_size: int = None) -> List[str]:
+        """Greedy-decode a list of float32 arrays (AudioProcessor and profiling use this)."""
+        texts = []
+        batch_size = batch_size or len(audios)
+        for i in range(0, len(audios), batch_size):
+            batch = audios[i:i + batch_size]
+            lengths = torch.tensor([len(a) for a in batch], dtype=torch.long)
+            signal = torch.zeros(len(batch), int(lengths.max()))
+            for j, audio in enumerate(batch):
+                signal[j, :len(audio)] = torch.as_tensor(audio)
+            with torch.no_grad():
+                _, encoded_len, predictions = self.forward(signal.to(self.device), lengths.to(self.device))
+            for tokens, _, _ in greedy_decode(predictions, encoded_len, self.blank_id):
+                texts.append(self.ids_to_text(tokens.tolist()))
+        return texts
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+    def parameters(self):
+        return iter(())
+
+
+class NemoBackend(ASRBackend):
+    """The configured NeMo EncDecCTCModel (parakeet-ctc-0.6b by default)."""
+
+    encoder_configurable = True
+
+    def __init__(self, device: str):
+        # NeMo is only imported when this backend is used
+        from .model import get_attention_context, get_subsampling_factor, load_model
+        self.model = load_model(device)
+        self.device = torch.device(device)
+        preprocessor_cfg = self.model.cfg.preprocessor
+        self.sample_rate = preprocessor_cfg.sample_rate
+        hop = int(preprocessor_cfg.window_stride * preprocessor_cfg.sample_rate)
+        self.frame_shift = hop * self.model.encoder.subsampling_factor
+        self.blank_id = self.model.decoder.num_classes_with_blank - 1
+        self._encoder_settings = (tuple(get_attention_context()), get_subsampling_factor())  # applied by load_model
+
+    def precision_modules(self):
+        return [self.model.encoder, self.model.decoder]
+
+    def apply_precision(self, precision):
+        super().apply_precision(precision)
+        if precision == "int8-dynamic":
+            # change_attention_model rebuilds the attention layers from float weights
+            self.encoder_configurable = False
+
+    def configure_encoder(self, attention_context, subsampling_factor):
+        settings = (tuple(attention_context), subsampling_factor)
+        if not self.encoder_configurable or settings == self._encoder_settings:
+            return
+        self.model.change_attention_model("rel_pos_local_attn", list(attention_context))
+        self.model.change_subsampling_conv_chunking_factor(subsampling_factor)
+        # The rebuilt attention layers come back in fp32
+        self.model.encoder.to(self.device, dtype=self.autocast_dtype or torch.float32)
+        self._encoder_settings = settings
+        logger.debug(f"Encoder on {self.device}: attention context {list(attention_context)}, "
+                     f"subsampling chunking {subsampling_factor}")
+
+    def forward(self, input_signal, input_signal_length):
+        with self.autocast():
+            return self.model.forward(input_signal=input_signal, input_signal_length=input_signal_length)
+
+    def ids_to_text(self, ids):
+        return self.model.tokenizer.ids_to_text(list(ids))
+
+    def ids_to_pieces(self, ids):
+        return self.model.tokenizer.ids_to_tokens(list(ids))
+
+    def to(self, device):
+        self.model = self.model.to(device)
+        self.device = torch.device(device)
+        return self
+
+    def eval(self):
+        self.model.eval()
+        return self
+
+    def parameters(self):
+        return self.model.parameters()
+
+
+class SyntheticBackend(ASRBackend):
+    """No model at all: sleeps like a GPU would and returns all-blank frames.
+
+    Cost is ``per_batch_ms + per_audio_second_ms * batch_size * padded_seconds``, so batching,
+    padding and queueing behave like the real thing without hardware or downloads.
+    """
+
+    def __init__(self, per_batch_ms: float = 5.0, per_audio_second_ms: float = 2.0, text: str = ""):
+        self.per_batch = per_batch_ms / 1000.0
+        self.per_audio_second = per_audio_second_ms / 1000.0
+        self.text = text
+
+    def forward(self, input_signal, input_signal_length):
+        batch_size, num_samples = input_signal.shape
+        padded_seconds = batch_size * num_samples / self.sample_rate
+        time.sleep(self.per_batch + self.per_audio_second * padded_seconds)
+
+        encoded_len = (input_signal_length + self.frame_shift - 1) // self.frame_shift
+        num_frames = int(encoded_len.max()) if batch_size else 0
+        predictions = torch.full((batch_size, num_frames), self.blank_id, dtype=torch.long)
+        log_probs = torch.zeros(batch_size, num_frames, 1)
+        return log_probs, encoded_len, predictions
+
+    def ids_to_text(self, ids):
+        return self.text
+
+
+class LogMelFeatures(torch.nn.Module):
+    """NeMo's FilterbankFeatures at inference time (no dither), from the exported filterbank and window."""
+
+    def __init__(self, filterbank: np.ndarray, window: np.ndarray, n_fft: int, hop_length: int,
+                 win_length: int, preemph: float = 0.97, mag_power: float = 2.0,
+                 log_zero_guard_value: float = 2 ** -24, normalize: str = "per_feature", **_):
+        super().__init__()
+        self.register_buffer("filterbank", torch.as_tensor(filterbank, dtype=torch.float32))
+        self.register_buffer("window", torch.as_tensor(window, dtype=torch.float32))
+        self.n_fft, self.hop_length, self.win_length = n_fft, hop_length, win_length
+        self.preemph = preemph
+        self.mag_power = mag_power
+        self.guard = log_zero_guard_value
+        self.normalize = normalize
+
+    def forward(self, x, lengths):
+        feature_len = lengths // self.hop_length + 1
+        if self.preemph:
+            x = torch.cat((x[:, :1], x[:, 1:] - self.preemph * x[:, :-1]), dim=1)
+            x = x.masked_fill(torch.arange(x.shape[1], device=x.device)[None, :] >= lengths[:, None], 0.0)
+        spec = torch.stft(x, n_fft=self.n_fft, hop_length=self.hop_length, win_length=self.win_length,
+                          window=self.window, center=True, pad_mode="constant", return_complex=True)
+        spec = torch.view_as_real(spec).pow(2).sum(-1).sqrt()
+        if self.mag_power != 1.0:
+            spec = spec.pow(self.mag_power)
+        features = torch.log(torch.matmul(self.filterbank, spec) + self.guard)
+
+        valid = torch.arange(features.shape[-1], device=x.device)[None, :] < feature_len[:, None]
+        if self.normalize == "per_feature":
+            mask = valid[:, None, :].to(features.dtype)
+            count = feature_len[:, None, None].to(features.dtype)
+            mean = (features * mask).sum(-1, keepdim=True) / count
+            var = (((features - mean) * mask) ** 2).sum(-1, keepdim=True) / (count - 1).clamp(min=1)
+            features = (features - mean) / (var.sqrt() + 1e-5)
+        return features.masked_fill(~valid[:, None, :], 0.0), feature_len
+
+
+class OnnxBackend(ASRBackend):
+    """The encoder + CTC head exported by tools/export_onnx.py, run with onnxruntime.
+
+    Features are computed in torch on the host and greedy decoding is a batched argmax over
+    the log-probs, so NeMo is not needed at serving time.
+    """
+
+    def __init__(self, model_dir: str, providers: Sequence[str] = ("CPUExecutionProvider",),
+                 intra_op_threads: int = 0):
+        import json
+        import os
+        import onnxruntime as ort  # optional dependency, only needed for this backend
+
+        with open(os.path.join(model_dir, "export_config.json")) as f:
+            settings = json.load(f)
+        with open(os.path.join(model_dir, "vocab.json")) as f:
+            self.vocab = json.load(f)
+        arrays = np.load(os.path.join(model_dir, "preprocessor.npz"))
+        self.featurizer = LogMelFeatures(arrays["filterbank"], arrays["window"], **settings).eval()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_dir, "encoder.onnx"), options,
+                                            providers=list(providers))
+        self.sample_rate = settings["sample_rate"]
+        self.frame_shift = settings["frame_shift"]
+        self.blank_id = settings["blank_id"]
+        logger.info(f"ONNX model loaded from {model_dir} with {self.session.get_providers()}")
+
+    def apply_precision(self, precision):
+        if precision != "fp32":
+            raise ValueError("The onnx backend runs the exported fp32 graph; set precision: fp32")
+        self.precision = precision
+
+    def forward(self, input_signal, input_signal_length):
+        with torch.no_grad():
+            features, feature_len = self.featurizer(input_signal.cpu().float(), input_signal_length.cpu())
+        log_probs, encoded_len = self.session.run(
+            ["log_probs", "encoded_len"],
+            {"features": features.numpy(), "lengths": feature_len.numpy().astype(np.int64)},
+        )
+        log_probs = torch.from_numpy(log_probs)
+        return log_probs, torch.from_numpy(encoded_len), log_probs.argmax(dim=-1)
+
+    def ids_to_text(self, ids):
+        return "".join(self.ids_to_pieces(ids)).replace("▁", " ").strip()
+
+    def ids_to_pieces(self, ids):
+        return [self.vocab[i] for i in ids if i < len(self.vocab)]
+
+
+TINY_CTC_VOCAB =[" ", "'"] + [chr(c) for c in range(ord("a"), ord("z") + 1)]
+
+
+class TinyCTCModel(torch.nn.Module):
+    """Log-mel features -> 3 strided conv blocks (8x subsampling, 80 ms frames) -> character CTC head."""
+
+    def __init__(self, n_mels: int = 80, hidden: int = 256, vocab_size: int = len(TINY_CTC_VOCAB)):
+        super().__init__()
+        import torchaudio
+        self.featurizer = torchaudio.transforms.MelSpectrogram(
+            sample_rate=16000, n_fft=512, win_length=400, hop_length=160, n_mels=n_mels
+        )
+        layers = []
+        channels = n_mels
+        for _ in range(3):
+            layers += [torch.nn.Conv1d(channels, hidden, kernel_size=5, stride=2, padding=2), torch.nn.GELU()]
+            channels = hidden
+        self.encoder = torch.nn.Sequential(*layers)
+        self.head = torch.nn.Conv1d(hidden, vocab_size + 1, kernel_size=1)  # blank is the last class
+
+    def forward(self, input_signal, input_signal_length):
+        features = torch.log(self.featurizer(input_signal) + 1e-6)
+        log_probs = self.head(self.encoder(features)).transpose(1, 2).log_softmax(dim=-1)
+        feature_len = input_signal_length // 160 + 1
+        encoded_len = feature_len
+        for _ in range(3):
+            encoded_len = (encoded_len - 1) // 2 + 1
+        return log_probs, encoded_len, log_probs.argmax(dim=-1)
+
+
+class TinyCTCBackend(ASRBackend):
+    """A small CPU-runnable CTC model with the same frame rate as parakeet.
+
+    Randomly initialised unless ``weights`` points at a state dict, which is enough for
+    exercising the scheduler, stitching and I/O with realistic compute per audio-second.
+    """
+
+    def __init__(self, device: str = "cpu", weights: str = None, hidden: int = 256):
+        torch.manual_seed(0)  # same random weights on every replica and run
+        self.model = TinyCTCModel(hidden=hidden)
+        if weights:
+            self.model.load_state_dict(torch.load(weights, map_location="cpu"))
+        self.device = torch.device(device)
+        self.model.to(self.device).eval()
+        self.blank_id = len(TINY_CTC_VOCAB)
+
+    def precision_modules(self):
+        return [self.model.encoder, self.model.head]
+
+    def forward(self, input_signal, input_signal_length):
+        with self.autocast():
+            return self.model(input_signal, input_signal_length)
+
+    def ids_to_text(self, ids):
+        return "".join(self.ids_to_pieces(ids))
+
+    def ids_to_pieces(self, ids):
+        return [TINY_CTC_VOCAB[i] for i in ids if i < len(TINY_CTC_VOCAB)]
+
+    def to(self, device):
+        self.model.to(device)
+        self.device = torch.device(device)
+        return self
+
+    def parameters(self):
+        return self.model.parameters()
+
+
+def create_backend(device: str, precision: str = None, name: str = None) -> ASRBackend:
+    """Build backend ``name`` (default: ``model.backend`` in config.yml) on ``device`` at
+    ``precision`` (default: ``precision`` in config.yml)."""
+    model_cfg = config["model"]
+    name = name or model_cfg.get("backend", "nemo")
+    if name == "nemo":
+        backend = NemoBackend(device)
+    elif name == "onnx":
+        backend = OnnxBackend(**model_cfg.get("onnx", {}))
+    elif name == "synthetic":
+        backend = SyntheticBackend(**model_cfg.get("synthetic", {}))
+    elif name == "tiny_ctc":
+        backend = TinyCTCBackend(device, **model_cfg.get("tiny_ctc", {}))
+    else:
+        raise ValueError(f"Unknown model backend: {name}")
+
+    backend.apply_precision(precision or config.get("precision", "fp32"))
+    return backend
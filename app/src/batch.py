@@ -0,0 +1,162 @@
+import io
+import json
+import time
+import asyncio
+import logging
+import tarfile
+import zipfile
+from collections import deque
+from typing import AsyncIterator, Iterator, List, Tuple
+
+from . import metrics
+from .AudioProcessor import LengthBucketBatchSampler
+from .batching import get_scheduler
+from .config import config
+from .inference import (frames_to_text, get_window_seconds, process_audio_chunked, request_profile, speech_frames,
+                        submit_speech_segments, submit_window, vad_segment_samples)
+from .pipeline import get_decode_stage
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def iter_archive(data: bytes, filename: str) -> Iterator[Tuple[str, bytes]]:
+    """(member name, bytes) for every regular file in a zip or tar(.gz), skipping hidden and macOS metadata files."""
+    def wanted(name):
+        base = name.rsplit("/", 1)[-1]
+        return base and not base.startswith(".") and not name.startswith("__MACOSX/")
+
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and wanted(info.filename):
+                    yield info.filename, archive.read(info)
+    else:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+            for member in archive:
+                if member.isfile() and wanted(member.name):
+                    yield member.name, archive.extractfile(member).read()
+
+
+async def _decode_group(items: List[Tuple[str, bytes]]):
+    """Decode a group of uploads in parallel on the decode pool; failures come back as exceptions."""
+    stage = get_decode_stage()
+    return await asyncio.gather(*(stage.decode(data) for _, data in items), return_exceptions=True)
+
+
+def _submit(clips):
+    # May block while the scheduler queue is full, so it runs off the event loop
+    return [submit_window(samples, request_profile(samples)) for samples in clips]
+
+
+def _submit_segments(clips, vad_cfg, sample_rate):
+    """VAD each clip and submit its speech segments: (segments, futures) per clip, nothing awaited."""
+    submitted = []
+    for samples in clips:
+        profile = request_profile(samples, sample_rate)
+        submitted.append(submit_speech_segments(samples, vad_segment_samples(sample_rate), sample_rate, vad_cfg, profile))
+    return submitted
+
+
+def _shielded(future):
+    # A client that disconnects cancels the awaiting task; the scheduler's future finishes unobserved
+    return asyncio.shield(asyncio.wrap_future(future))
+
+
+async def _clip_frames(num_samples, segments, futures):
+    return speech_frames(num_samples, segments, [await _shielded(future) for future in futures])
+
+
+async def _batch_lines(names, durations, awaitables) -> Tuple[List[str], int]:
+    """NDJSON lines for one finished batch, and how many of its files failed."""
+    lines, failed = [], 0
+    for name, duration, awaitable in zip(names, durations, awaitables):
+        try:
+            result = await awaitable
+            transcription = result if isinstance(result, str) else frames_to_text(result)
+            lines.append(json.dumps({"file": name, "duration": duration, "transcription": transcription}))
+        except Exception as e:
+            logger.error(f"Batch item {name} failed: {e}")
+            failed += 1
+            lines.append(json.dumps({"file": name, "error": str(e)}))
+    return lines, failed
+
+
+async def transcribe_batch(items: List[Tuple[str, bytes]]) -> AsyncIterator[str]:
+    """Transcribe many uploads as length-bucketed batches, yielding one NDJSON line per file.
+
+    Files are decoded ``group_files`` at a time; the next group decodes while this one is
+    inferred. Within a group, clips are sorted into buckets of similar duration and each batch
+    is submitted to the scheduler whole, so it becomes one padded forward pass instead of a
+    batch of 1 per request. Up to ``lookahead_batches`` batches are queued ahead of the one
+    whose results are awaited, which keeps every replica busy. With ``vad.enabled``, each clip's
+    speech segments are submitted straight to the scheduler, as /transcribe segments it, so a
+    file gets the same transcription from both. Without VAD, clips that fit one window are
+    inferred whole with their duration bucket's profile and longer ones take the usual
+    /transcribe path. A final ``summary`` line reports totals.
+    """
+    batch_cfg = config.get("batch_endpoint", {})
+    group_files = batch_cfg.get("group_files", 256)
+    lookahead = batch_cfg.get("lookahead_batches", 4)
+    max_batch_size = get_scheduler().max_batch_size
+    max_window = get_window_seconds()
+    vad_cfg = config.get("vad", {})
+    sample_rate = config["model"]["sample_rate"]
+
+    start = time.time()
+    errors, audio_seconds = 0, 0.0
+    groups = [items[i:i + group_files] for i in range(0, len(items), group_files)]
+    next_decode = asyncio.create_task(_decode_group(groups[0])) if groups else None
+
+    for g, group in enumerate(groups):
+        decoded = await next_decode
+        if g + 1 < len(groups):
+            next_decode = asyncio.create_task(_decode_group(groups[g + 1]))
+
+        ok = []
+        for (name, _), result in zip(group, decoded):
+            if isinstance(result, Exception):
+                errors += 1
+                yield json.dumps({"file": name, "error": f"decode failed: {result}"})
+            else:
+                ok.append((name, *result))
+        durations = [duration for _, _, duration in ok]
+        audio_seconds += sum(durations)
+
+        pending = deque()
+        for batch in LengthBucketBatchSampler(durations, max_batch_seconds=max_batch_size * max_window,
+                                              max_batch_size=max_batch_size):
+            clips = [ok[i][1] for i in batch]
+            if vad_cfg.get("enabled", False):
+                submitted = await asyncio.to_thread(_submit_segments, clips, vad_cfg, sample_rate)
+                awaitables = [asyncio.ensure_future(_clip_frames(len(samples), *segments))
+                              for samples, segments in zip(clips, submitted)]
+            else:
+                short = [i for i in batch if durations[i] <= max_window]
+                futures = dict(zip(short, await asyncio.to_thread(_submit, [ok[i][1] for i in short])))
+                awaitables = [_shielded(futures[i]) if i in futures
+                              else asyncio.ensure_future(asyncio.to_thread(process_audio_chunked, ok[i][1]))
+                              for i in batch]
+            pending.append(([ok[i][0] for i in batch], [durations[i] for i in batch], awaitables))
+
+            # Emit finished batches; wait only once enough batches are queued behind the oldest
+            while pending and (len(pending) > lookahead or all(a.done() for a in pending[0][2])):
+                lines, failed = await _batch_lines(*pending.popleft())
+                errors += failed
+                for line in lines:
+                    yield line
+        while pending:
+            lines, failed = await _batch_lines(*pending.popleft())
+            errors += failed
+            for line in lines:
+                yield line
+
+    elapsed = time.time() - start
+    metrics.record_request("transcribe_batch", audio_seconds, elapsed)
+    yield json.dumps({"summary": {"files": len(items), "errors": errors,
+                                  "audio_seconds": audio_seconds, "elapsed": elapsed}})
@@ -0,0 +1,279 @@
+import queue
+import threading
+import time
+import logging
+import functools
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+import torch
+
+from . import metrics
+from .config import config
+from .memory import get_memory_budget
+from .model import encoder_settings, get_model_pool
+from .profiling import get_runtime_profile
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """Collects chunks from all in-flight requests and runs them as one batched model call.
+
+    Each chunk may carry its request's duration-bucket profile. Chunks only share a batch when
+    their profiles agree on the encoder settings, and a profile's ``batch_size`` caps batches
+    it is part of (never above ``max_batch_size``); ``run_batch(items, profile)`` gets the
+    profile of the batch's first chunk.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any], Optional[dict]], List[Any]], max_batch_size: int = 8, max_wait_ms: float = 20,
+                 max_queue_depth: int = 0, can_add: Callable[[List[Any], Any], bool] = None, name: str = "batch-scheduler"):
+        self.run_batch = run_batch
+        self.name = name
+        # Optional admission check (e.g. memory budget); an item that doesn't fit opens the next batch
+        self.can_add = can_add
+        self._held = deque()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        # Bounded: submit blocks once max_queue_depth chunks are waiting (0 = unbounded)
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._in_flight = 0
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+        self._queue_depth_gauge = metrics.QUEUE_DEPTH.labels(replica=name)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item: Any, profile: dict = None) -> Future:
+        """Queue one chunk and return a future resolving to its own result.
+
+        Blocks while the queue is full, so don't call it from the event loop thread.
+        """
+        self.start()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter(), profile))
+        return future
+
+    def load(self) -> int:
+        """Chunks waiting or running on this scheduler."""
+        with self._lock:
+            return self._queue.qsize() + self._in_flight + len(self._held)
+
+    def _collect(self):
+        # Block for the first item, then fill the batch until it is full or the wait window closes.
+        # Chunks that can't join (other encoder settings, or over the budget) are held back in
+        # arrival order and open the following batches
+        held, self._held = self._held, deque()
+        batch = [held.popleft() if held else self._queue.get()]
+        group = encoder_settings(batch[0][3])
+        limit = batch_limit(batch[0][3], self.max_batch_size)
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < limit:
+            if held:
+                entry = held.popleft()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if encoder_settings(entry[3]) != group or len(batch) >= batch_limit(entry[3], self.max_batch_size):
+                self._held.append(entry)
+            elif self.can_add is not None and not self.can_add([e[0] for e in batch], entry[0]):
+                self._held.append(entry)
+                break
+            else:
+                batch.append(entry)
+        self._held.extend(held)
+        return batch
+
+    def _loop(self):
+        # Must never exit: every later submit to this replica would wait forever
+        while True:
+            try:
+                self._run_next_batch()
+            except Exception as e:
+                logger.error(f"Scheduler {self.name} iteration failed: {str(e)}", exc_info=True)
+
+    def _run_next_batch(self):
+        # Futures cancelled while queued (e.g. a client went away) are dropped here; the rest
+        # become running and can no longer be cancelled, so delivering results can't fail
+        batch = [entry for entry in self._collect() if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        items = [item for item, _, _, _ in batch]
+        futures = [future for _, future, _, _ in batch]
+        with self._lock:
+            self._in_flight = len(items)
+
+        batch_start = time.perf_counter()
+        for _, _, enqueued_at, _ in batch:
+            metrics.observe_stage("window_queue", batch_start - enqueued_at)
+        metrics.BATCH_SIZE.observe(len(items))
+        self._queue_depth_gauge.set(self._queue.qsize())
+
+        start = time.monotonic()
+        try:
+            results = self.run_batch(items, batch[0][3])
+        except Exception as e:
+            logger.error(f"Batch of {len(items)} failed: {str(e)}", exc_info=True)
+            results = None
+            for future in futures:
+                future.set_exception(e)
+
+        metrics.observe_stage("inference", time.perf_counter() - batch_start)
+        with self._lock:
+            self._in_flight = 0
+            self._busy_seconds += time.monotonic() - start
+            if results is not None:
+                self._batches += 1
+                self._items += len(items)
+                self._last_batch_size = len(items)
+
+        if results is not None:
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def stats(self):
+        with self._lock:
+            avg_batch_size = self._items / self._batches if self._batches else 0.0
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._queue.maxsize,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "last_batch_size": self._last_batch_size,
+                "avg_batch_size": avg_batch_size,
+                "avg_batch_fill": avg_batch_size / self.max_batch_size,
+                "in_flight": self._in_flight,
+                "utilization": self._busy_seconds / max(time.monotonic() - self._started_at, 1e-9),
+            }
+
+
+class ReplicaDispatcher:
+    """Fronts one BatchScheduler per model replica and sends each chunk to the least-loaded one."""
+
+    def __init__(self, schedulers: List[BatchScheduler]):
+        self.schedulers = schedulers
+        self.max_batch_size = schedulers[0].max_batch_size
+        self._lock = threading.Lock()
+
+    def submit(self, item: Any, profile: dict = None) -> Future:
+        with self._lock:
+            target = min(self.schedulers, key=lambda s: s.load())
+        return target.submit(item, profile)
+
+    def stats(self):
+        replicas = {s.name: s.stats() for s in self.schedulers}
+        total_batches = sum(r["batches"] for r in replicas.values())
+        total_items = sum(r["items"] for r in replicas.values())
+        avg_batch_size = total_items / total_batches if total_batches else 0.0
+        return {
+            "queue_depth": sum(r["queue_depth"] for r in replicas.values()),
+            "batches": total_batches,
+            "items": total_items,
+            "avg_batch_size": avg_batch_size,
+            "avg_batch_fill": avg_batch_size / self.max_batch_size,
+            "replicas": replicas,
+        }
+
+
+def fits_memory_budget(batch, chunk):
+    """Admission check: would adding ``chunk`` keep the padded batch under the VRAM ceiling?"""
+    budget = get_memory_budget()
+    if budget is None:
+        return True
+    longest = max(len(chunk), max(len(item) for item in batch))
+    return budget.fits(len(batch) + 1, longest / config["model"]["sample_rate"])
+
+
+def batch_limit(profile, default: int) -> int:
+    """A profile may only shrink batches below the scheduler's own ``max_batch_size``."""
+    return min((profile or {}).get("batch_size") or default, default)
+
+
+_dispatch_locks = {}
+_dispatch_locks_guard = threading.Lock()
+
+def dispatch_lock(model) -> threading.Lock:
+    """One lock per replica, held for each forward pass including its encoder switch."""
+    with _dispatch_locks_guard:
+        return _dispatch_locks.setdefault(id(model), threading.Lock())
+
+
+def forward_batch(model, chunks, profile: dict = None):
+    """Run one padded forward pass of ``model`` (an ASRBackend) over a batch of float32 chunks.
+
+    The replica's encoder is first switched to the batch's profile (see ``encoder_settings``);
+    that is a no-op while consecutive batches share settings. Switching and the forward pass
+    happen under the replica's dispatch lock, so callers outside its scheduler (warmup,
+    profiling) never change the encoder under a running batch.
+
+    Returns the greedy (argmax) prediction of every valid output frame for each chunk, so
+    callers can stitch overlapping windows before collapsing to text.
+    """
+    device = model.device
+    lengths = torch.tensor([len(chunk) for chunk in chunks], dtype=torch.long)
+    signal = torch.zeros(len(chunks), int(lengths.max()))
+    for i, chunk in enumerate(chunks):
+        signal[i, :len(chunk)] = torch.from_numpy(chunk)
+
+    with dispatch_lock(model):
+        model.configure_encoder(*encoder_settings(profile))
+
+        # The caching allocator keeps its pool between batches; the budget keeps peaks in check instead
+        budget = get_memory_budget() if device.type == "cuda" else None
+        if budget is not None:
+            static_bytes = torch.cuda.memory_allocated(device)
+            torch.cuda.reset_peak_memory_stats(device)
+
+        with torch.no_grad():
+            _, encoded_len, predictions = model.forward(signal.to(device), lengths.to(device))
+        predictions = predictions.cpu().numpy()
+        encoded_len = encoded_len.cpu().numpy()
+
+        if device.type == "cuda":
+            peak_bytes = torch.cuda.max_memory_allocated(device)
+            metrics.record_gpu_peak(device, peak_bytes)
+            if budget is not None:
+                seconds = int(lengths.max()) / config["model"]["sample_rate"]
+                budget.observe(len(chunks), seconds, static_bytes, peak_bytes)
+
+    return [predictions[i, :encoded_len[i]] for i in range(len(chunks))]
+
+
+scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> ReplicaDispatcher:
+    global scheduler
+    with _scheduler_lock:
+        if scheduler is None:
+            batching_cfg = config.get("batching", {})
+            schedulers = [
+                BatchScheduler(
+                    functools.partial(forward_batch, replica),
+                    max_batch_size=get_runtime_profile().get("batch_size", batching_cfg.get("max_batch_size", 8)),
+                    max_wait_ms=batching_cfg.get("max_wait_ms", 20),
+                    max_queue_depth=batching_cfg.get("max_queue_depth", 0),
+                    can_add=fits_memory_budget,
+                    name=f"replica-{i}-{device}",
+                )
+                for i, (device, replica) in enumerate(get_model_pool())
+            ]
+            scheduler = ReplicaDispatcher(schedulers)
+    return scheduler
@@ -0,0 +1,232 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 ** 2
+
+
+class MemoryTier:
+    """In-process LRU bounded by total value bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskTier:
+    """One file per key under ``directory``; least recently used files are removed past ``max_bytes``."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)  # mtime doubles as the LRU clock
+            return value
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.size += len(value)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted((entry for entry in os.scandir(self.directory) if entry.is_file()),
+                         key=lambda entry: entry.stat().st_mtime)
+        self.size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                self.size -= entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+class RedisTier:
+    """Shared tier across replicas; Redis' own maxmemory policy bounds it, entries also expire."""
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis  # optional dependency, only needed for this tier
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl_seconds
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(f"txcache:{key}")
+
+    def put(self, key: str, value: bytes):
+        self.client.set(f"txcache:{key}", value, ex=self.ttl)
+
+
+def model_fingerprint() -> str:
+    """Everything besides the audio that changes what the model emits for a window."""
+    fingerprint = {
+        "model": config["model"],
+        "precision": config.get("precision", "fp32"),
+    }
+    return hashlib.blake2b(json.dumps(fingerprint, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+
+class TranscriptCache:
+    """Content-addressed cache of per-window frame predictions.
+
+    Keys are a hash of the window's decoded PCM, its encoder settings and the model
+    fingerprint, so a re-upload of the same recording (in any container) hits. With VAD on,
+    windows are speech segments cut at pauses with a length cap that doesn't depend on the
+    request's duration bucket. A recording re-sent with a new tail therefore only misses on
+    the segments that changed, even when it lands in another bucket, as long as that bucket
+    runs the same encoder settings (tools/autotune.py keeps them unless another is clearly
+    faster). Without VAD, windows are cut at fixed strides of the bucket's window length, so
+    a new tail only reuses windows while the bucket stays the same.
+
+    Writes go through ``put_async`` on one writer thread, so the scheduler thread that
+    completes a batch never waits on disk or Redis.
+    """
+
+    def __init__(self, memory: MemoryTier, second_tier=None):
+        self.memory = memory
+        self.second_tier = second_tier
+        self.fingerprint = model_fingerprint()
+        self._lock = threading.Lock()
+        self._hits = {"memory": 0, "second_tier": 0}
+        self._misses = 0
+        self._bytes_saved = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+
+    def key(self, samples: np.ndarray, encoder=None) -> str:
+        """``encoder`` is the (attention context, subsampling) the window runs with; profiles can
+        change it per request, and attention context changes the predictions."""
+        digest = hashlib.blake2b(samples.tobytes(), digest_size=16)
+        if encoder is not None:
+            digest.update(json.dumps(encoder).encode())
+        return f"{self.fingerprint}-{digest.hexdigest()}"
+
+    def get(self, key: str, audio_bytes: int = 0) -> Optional[np.ndarray]:
+        value = self.memory.get(key)
+        tier = "memory"
+        if value is None and self.second_tier is not None:
+            try:
+                value = self.second_tier.get(key)
+            except Exception as e:
+                logger.warning(f"Cache tier lookup failed: {e}")
+            tier = "second_tier"
+            if value is not None:
+                self.memory.put(key, value)
+
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits[tier] += 1
+            self._bytes_saved += audio_bytes
+        return np.frombuffer(value, dtype=np.int32)
+
+    def put_async(self, key: str, frames: np.ndarray):
+        self._writer.submit(self._put_logged, key, frames)
+
+    def _put_logged(self, key: str, frames: np.ndarray):
+        try:
+            self.put(key, frames)
+        except Exception as e:
+            logger.warning(f"Cache write failed: {e}")
+
+    def put(self, key: str, frames: np.ndarray):
+        value = frames.astype(np.int32).tobytes()
+        self.memory.put(key, value)
+        if self.second_tier is not None:
+            try:
+                self.second_tier.put(key, value)
+            except Exception as e:
+                logger.warning(f"Cache tier write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            hits = sum(self._hits.values())
+            lookups = hits + self._misses
+            return {
+                "hits": dict(self._hits),
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "audio_bytes_saved": self._bytes_saved,
+                "memory_entries": len(self.memory),
+                "memory_mb": self.memory.size / MIB,
+                "second_tier": type(self.second_tier).__name__ if self.second_tier else None,
+            }
+
+
+transcript_cache = None
+_cache_lock = threading.Lock()
+
+def get_transcript_cache() -> Optional[TranscriptCache]:
+    global transcript_cache
+    cache_cfg = config.get("cache", {})
+    if not cache_cfg.get("enabled", False):
+        return None
+
+    with _cache_lock:
+        if transcript_cache is None:
+            second_tier = None
+            tier = cache_cfg.get("tier2", "none")
+            if tier == "disk":
+                second_tier = DiskTier(cache_cfg.get("disk_dir", "/tmp/transcript_cache"),
+                                       cache_cfg.get("disk_mb", 2048) * MIB)
+            elif tier == "redis":
+                from .redis_connect import REDIS_URL
+                second_tier = RedisTier(REDIS_URL, cache_cfg.get("redis_ttl_seconds", 7 * 24 * 3600))
+
+            transcript_cache = TranscriptCache(MemoryTier(cache_cfg.get("memory_mb", 256) * MIB), second_tier)
+            logger.info(f"Transcript cache enabled (tier2: {tier})")
+    return transcript_cache
@@ -0,0 +1,74 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+PAD = -1  # marks frames past an utterance's length; never a real token id
+
+
+def greedy_decode(outputs: torch.Tensor, lengths: torch.Tensor, blank_id: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Greedy CTC decode a whole batch with tensor ops: argmax, merge repeats, drop blanks.
+
+    ``outputs`` is either ``(B, T, V)`` log-probs or ``(B, T)`` per-frame predictions. Returns,
+    per utterance, ``(token ids, start frame, end frame)`` where a token spans the frames
+    ``[start, end)`` of its run of repeats. There is no per-utterance or per-frame Python loop:
+    padding is replaced by a sentinel and one extra sentinel column ends every row, so the
+    flattened batch can be collapsed in one pass and rows never merge.
+    """
+    preds = outputs.argmax(dim=-1) if outputs.dim() == 3 else outputs
+    batch_size, num_frames = preds.shape
+    lengths = lengths.to(preds.device)
+
+    valid = torch.arange(num_frames, device=preds.device)[None, :] < lengths[:, None]
+    padded = torch.full((batch_size, num_frames + 1), PAD, dtype=torch.long, device=preds.device)
+    padded[:, :num_frames] = torch.where(valid, preds.long(), PAD)
+    flat = padded.flatten()
+
+    is_new = torch.ones_like(flat, dtype=torch.bool)
+    is_new[1:] = flat[1:] != flat[:-1]
+    keep = is_new & (flat != blank_id) & (flat != PAD)
+
+    run_starts = torch.nonzero(is_new).squeeze(1)
+    positions = torch.nonzero(keep).squeeze(1)
+    # A run ends where the next one starts; the sentinel column guarantees one in the same row
+    run_ends = run_starts[torch.searchsorted(run_starts, positions, right=True)]
+
+    row = positions // (num_frames + 1)
+    counts = torch.bincount(row, minlength=batch_size).tolist()
+    tokens = flat[positions].cpu().numpy()
+    starts = (positions % (num_frames + 1)).cpu().numpy()
+    ends = (run_ends % (num_frames + 1)).cpu().numpy()
+
+    offsets = np.cumsum([0] + counts)
+    return [(tokens[a:b], starts[a:b], ends[a:b]) for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def token_timestamps(pieces: Sequence[str], starts: np.ndarray, ends: np.ndarray, seconds_per_frame: float) -> List[Dict]:
+    return [
+        {"token": piece, "start": round(float(start) * seconds_per_frame, 3), "end": round(float(end) * seconds_per_frame, 3)}
+        for piece, start, end in zip(pieces, starts, ends)
+    ]
+
+
+def word_timestamps(pieces: Sequence[str], starts: np.ndarray, ends: np.ndarray, seconds_per_frame: float) -> List[Dict]:
+    """Group token pieces into words: a SentencePiece ``▁`` prefix or a space token starts a new word."""
+    words = []
+    new_word = True
+    for piece, start, end in zip(pieces, starts, ends):
+        text = piece.replace("▁", " ")
+        if text.startswith(" "):
+            new_word = True
+        text = text.strip()
+        if not text:
+            continue
+        if new_word or not words:
+            words.append({"word": text, "start": float(start), "end": float(end)})
+        else:
+            words[-1]["word"] += text
+            words[-1]["end"] = float(end)
+        new_word = False
+
+    for word in words:
+        word["start"] = round(word["start"] * seconds_per_frame, 3)
+        word["end"] = round(word["end"] * seconds_per_frame, 3)
+    return words
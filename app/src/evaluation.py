@@ -0,0 +1,233 @@
+import os
+import glob
+import json
+import time
+import random
+import logging
+import multiprocessing as mp
+from queue import Empty
+from typing import Dict, List, Sequence
+
+import jiwer
+import soundfile as sf
+from torch.utils.data import DataLoader, Dataset
+
+from .AudioProcessor import LengthBucketBatchSampler, collate_batch
+from .audio_cache import open_audio_cache
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (5, 10, 15, 20, 30)  # seconds; the last bucket is open-ended
+
+
+def default_index_path(root_dir: str) -> str:
+    """Next to the dataset, e.g. LibriSpeech/test-clean.index.jsonl."""
+    return os.path.normpath(root_dir) + ".index.jsonl"
+
+
+def load_references(root_dir: str) -> Dict[str, str]:
+    """Lowercase reference text of every utterance in the LibriSpeech ``*.trans.txt`` files, by utterance id."""
+    references = {}
+    for trans_file in glob.glob(os.path.join(root_dir, "**", "*.trans.txt"), recursive=True):
+        with open(trans_file, "r") as f:
+            for line in f:
+                parts = line.strip().split(maxsplit=1)
+                if len(parts) == 2:
+                    references[parts[0]] = parts[1].lower()
+    return references
+
+
+def build_index(root_dir: str, index_path: str = None, rebuild: bool = False) -> List[Dict]:
+    """One entry per utterance: id, path, speaker, chapter, duration, reference.
+
+    Transcripts are parsed and durations read from the headers once; later runs load the
+    persisted JSONL instead of walking the tree and calling sf.info per file.
+    """
+    index_path = index_path or default_index_path(root_dir)
+    if not rebuild and os.path.isfile(index_path):
+        with open(index_path, "r") as f:
+            return [json.loads(line) for line in f]
+
+    references = load_references(root_dir)
+    entries = []
+    for path in sorted(glob.glob(os.path.join(root_dir, "**", "*.flac"), recursive=True)):
+        utterance_id = os.path.splitext(os.path.basename(path))[0]
+        if utterance_id not in references:
+            continue
+        speaker, chapter = utterance_id.split("-")[:2]  # LibriSpeech: speaker-chapter-utterance
+        info = sf.info(path)
+        entries.append({
+            "id": utterance_id,
+            "path": os.path.abspath(path),
+            "speaker": speaker,
+            "chapter": chapter,
+            "duration": info.frames / info.samplerate,
+            "reference": references[utterance_id],
+        })
+
+    with open(index_path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    logger.info(f"Indexed {len(entries)} utterances into {index_path}")
+    return entries
+
+
+def sample_entries(entries: List[Dict], count: int, seed: int = None) -> List[Dict]:
+    """A random subset of ``count`` index entries (all of them if there are fewer), reproducible per seed."""
+    return random.Random(seed).sample(entries, min(count, len(entries)))
+
+
+def duration_bucket(duration: float) -> str:
+    low = 0
+    for high in DURATION_BUCKETS:
+        if duration < high:
+            return f"{low}-{high}s"
+        low = high
+    return f"{low}s+"
+
+
+class WERAccumulator:
+    """Word errors and reference words per group, so WER can be read at any point of a run."""
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, reference: str, hypothesis: str, groups: Sequence[str]):
+        out = jiwer.process_words(reference, hypothesis or "")
+        errors = out.substitutions + out.deletions + out.insertions
+        words = out.substitutions + out.deletions + out.hits
+        for group in ("all", *groups):
+            count = self.counts.setdefault(group, [0, 0, 0])
+            count[0] += errors
+            count[1] += words
+            count[2] += 1
+
+    def wer(self, group: str = "all") -> float:
+        errors, words, _ = self.counts.get(group, (0, 0, 0))
+        return errors / words if words else 0.0
+
+    def breakdown(self, prefix: str) -> Dict[str, Dict]:
+        return {
+            group[len(prefix):]: {"wer": errors / words if words else 0.0, "utterances": n, "words": words}
+            for group, (errors, words, n) in sorted(self.counts.items()) if group.startswith(prefix)
+        }
+
+
+class IndexDataset(Dataset):
+    def __init__(self, entries, cache=None):
+        self.entries = entries
+        self.cache = cache
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, idx):
+        if self.cache is not None:
+            return idx, self.cache.load(self.entries[idx]["path"])
+        audio, _ = sf.read(self.entries[idx]["path"], dtype="float32")
+        return idx, audio
+
+
+def shard_entries(entries: List[Dict], num_shards: int) -> List[List[Dict]]:
+    """Split into shards of near-equal total audio (longest first onto the lightest shard)."""
+    shards = [[] for _ in range(num_shards)]
+    loads = [0.0] * num_shards
+    for entry in sorted(entries, key=lambda e: e["duration"], reverse=True):
+        target = loads.index(min(loads))
+        shards[target].append(entry)
+        loads[target] += entry["duration"]
+    return shards
+
+
+def run_shard(shard_id, device, entries, precision, max_batch_seconds, loader_workers, cpu_threads, audio_cache,
+              queue):
+    """Worker process: one backend on ``device``, batched over length buckets of its shard."""
+    try:
+        import torch
+        from .backends import create_backend
+        if device == "cpu":
+            torch.set_num_threads(cpu_threads)  # CPU shards split the cores instead of oversubscribing
+        backend = create_backend(device, precision)
+        sampler = LengthBucketBatchSampler([e["duration"] for e in entries], max_batch_seconds=max_batch_seconds)
+        loader = DataLoader(IndexDataset(entries, open_audio_cache(audio_cache)), batch_sampler=sampler, collate_fn=collate_batch,
+                            num_workers=loader_workers)
+        for batch in loader:
+            start = time.time()
+            texts = backend.transcribe([audio for _, audio in batch], batch_size=len(batch))
+            queue.put((shard_id, [(entries[idx]["id"], text) for (idx, _), text in zip(batch, texts)],
+                       time.time() - start))
+    except Exception as e:
+        logger.error(f"Shard {shard_id} on {device} failed: {e}", exc_info=True)
+        queue.put((shard_id, f"{type(e).__name__}: {e}", 0.0))  # exceptions don't always pickle
+        return
+    queue.put((shard_id, None, 0.0))
+
+
+def evaluate(entries: List[Dict], devices: Sequence[str], precision: str = None, max_batch_seconds: float = 600.0,
+             loader_workers: int = 2, progress=None, audio_cache: str = None) -> Dict:
+    """Transcribe ``entries`` across one worker process per device; WER accumulates as batches land.
+
+    With ``audio_cache`` (a directory from tools/build_audio_cache.py) audio comes from its
+    memory-mapped shards instead of being decoded again.
+    """
+    by_id = {entry["id"]: entry for entry in entries}
+    shards = shard_entries(entries, len(devices))
+    ctx = mp.get_context("spawn")  # CUDA can't be forked into workers
+    queue = ctx.Queue()
+    cpu_threads = max(1, (os.cpu_count() or 1) // max(1, list(devices).count("cpu")))
+    workers = [
+        ctx.Process(target=run_shard,
+                    args=(i, device, shard, precision, max_batch_seconds, loader_workers, cpu_threads, audio_cache,
+                          queue))
+        for i, (device, shard) in enumerate(zip(devices, shards))
+    ]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+
+    accumulator = WERAccumulator()
+    hypotheses = {}
+    inference_seconds = [0.0] * len(workers)
+    running = len(workers)
+    while running:
+        try:
+            shard_id, results, seconds = queue.get(timeout=5)
+        except Empty:
+            crashed = [w for w in workers if w.exitcode not in (None, 0)]
+            if crashed:
+                for worker in workers:
+                    worker.terminate()
+                raise RuntimeError(f"Eval worker exited with code {crashed[0].exitcode}")
+            continue
+        if results is None:
+            running -= 1
+            continue
+        if isinstance(results, str):
+            for worker in workers:
+                worker.terminate()
+            raise RuntimeError(f"Shard {shard_id} failed: {results}")
+        inference_seconds[shard_id] += seconds
+        for utterance_id, text in results:
+            entry = by_id[utterance_id]
+            hypotheses[utterance_id] = text
+            accumulator.add(entry["reference"], text.lower(),
+                            (f"speaker:{entry['speaker']}", f"duration:{duration_bucket(entry['duration'])}"))
+        if progress is not None:
+            progress(len(results), accumulator.wer())
+    for worker in workers:
+        worker.join()
+
+    wall_time = time.time() - start
+    audio_seconds = sum(entry["duration"] for entry in entries)
+    return {
+        "utterances": len(entries),
+        "audio_seconds": audio_seconds,
+        "wall_time": wall_time,
+        "rtf": wall_time / audio_seconds if audio_seconds else 0.0,
+        "inference_rtf": max(inference_seconds) / audio_seconds if audio_seconds else 0.0,
+        "devices": list(devices),
+        "wer": accumulator.wer(),
+        "per_duration": accumulator.breakdown("duration:"),
+        "per_speaker": accumulator.breakdown("speaker:"),
+        "hypotheses": hypotheses,
+    }
@@ -1,44 +1,187 @@
-import io
+import numpy as np
 import torch
-import torchaudio
-from typing import List
+from concurrent.futures import Future
+from typing import List, Tuple
 import logging
-from .model import get_model
+from . import metrics
+from .batching import get_scheduler
+from .cache import get_transcript_cache
+from .config import config
+from .memory import get_memory_budget
+from .model import encoder_settings, get_model, get_frame_shift, get_blank_id
+from .profiling import get_runtime_profile, profile_for_duration
+from .decoding import greedy_decode, token_timestamps, word_timestamps
+from .stitching import make_windows, stitch_frames
+from .vad import speech_segments
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_audio_chunked(audio_data: bytes, chunk_duration: int = 1800, sample_rate: int = 16000) -> str: #8313MiB 
+DEFAULT_WINDOW_SECONDS = 40
+
+def get_window_seconds(profile: dict = None) -> float:
+    """Configured window length. With ``auto``: the request's duration-bucket profile's, or the
+    default profiled one if there is a results table (see src/profiling.py), else the longest
+    one the memory budget allows at full batch."""
+    window_seconds = config.get("chunking", {}).get("window_seconds", "auto")
+    if window_seconds != "auto":
+        return window_seconds
+    for candidate in (profile or {}, get_runtime_profile()):
+        if "window_seconds" in candidate:
+            return candidate["window_seconds"]
+
+    budget = get_memory_budget()
+    if budget is None:
+        return DEFAULT_WINDOW_SECONDS
+    return budget.choose_window_seconds(get_scheduler().max_batch_size)
+
+def vad_segment_samples(sample_rate: int = 16000) -> int:
+    """Longest VAD segment: the default window, not the request's bucket one, so segments (and
+    their cache keys) stay the same when the same audio arrives in a longer upload."""
+    return int(get_window_seconds() * sample_rate)
+
+def request_profile(samples: np.ndarray, sample_rate: int = 16000) -> dict:
+    """The duration-bucket profile a request runs with (empty when nothing is profiled)."""
+    profile = profile_for_duration(len(samples) / sample_rate)
+    if "bucket" in profile:
+        metrics.record_profile(profile["bucket"])
+    return profile
+
+def submit_window(window: np.ndarray, profile: dict = None) -> Future:
+    """Frame predictions for one window: from the transcript cache if seen before, else via the scheduler."""
+    cache = get_transcript_cache()
+    if cache is None:
+        return get_scheduler().submit(window, profile)
+
+    key = cache.key(window, encoder_settings(profile))
+    cached = cache.get(key, audio_bytes=window.nbytes)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+
+    def store(done: Future):
+        # Runs on the scheduler thread; the write itself happens on the cache's writer thread
+        if done.exception() is None:
+            cache.put_async(key, done.result())
+
+    future = get_scheduler().submit(window, profile)
+    future.add_done_callback(store)
+    return future
+
+def decode_frames(frames: np.ndarray):
+    """Collapse stitched frame predictions: (token ids, start frame, end frame)."""
+    frames = torch.tensor(frames, dtype=torch.long)[None]
+    return greedy_decode(frames, torch.tensor([frames.shape[1]]), get_blank_id(get_model()))[0]
+
+def frames_to_text(frames: np.ndarray) -> str:
+    """Collapse stitched frame predictions and detokenize them."""
+    tokens, _, _ = decode_frames(frames)
+    return get_model().ids_to_text(tokens.tolist())
+
+def frames_to_timestamps(frames: np.ndarray, sample_rate: int = 16000) -> dict:
+    """Text plus token and word timings in seconds; stitched frames are on the original timeline."""
     model = get_model()
-#def process_audio_chunked(audio_data: bytes, chunk_duration: int = 2400, sample_rate: int = 16000) -> str: #10245MiB
-#def process_audio_chunked(audio_data: bytes, chunk_duration: int = 240, sample_rate: int = 16000) -> str: #10245MiB
-    """Process audio in chunks efficiently from memory."""
-    results = []
-    
-    # Load audio data from bytes
-    audio_io = io.BytesIO(audio_data)
-    waveform, loaded_sample_rate = torchaudio.load(audio_io)
-    logger.info(f"Loaded waveform shape: {waveform.shape}, Sample rate: {loaded_sample_rate}")
-   
-    logger.info(f"Final waveform shape before chunking: {waveform.shape}")
-    
-    chunk_size = chunk_duration * sample_rate
-    for i in range(0, waveform.shape[1], chunk_size):
-        chunk = waveform[:, i:i+chunk_size]
-       
-        with torch.no_grad():
-            chunk_result = model.transcribe([chunk.numpy().squeeze()], batch_size=1) #8313MiB 74.61s 0.00491
-            #chunk_result = model.transcribe([chunk.numpy().squeeze()], batch_size=4)
-            #chunk_result = model.transcribe([chunk.numpy().squeeze()], batch_size=512, num_workers=2)
-        results.append(chunk_result[0])
-        
-        torch.cuda.empty_cache()  # Clear GPU cache after each chunk
+    tokens, starts, ends = decode_frames(frames)
+    pieces = model.ids_to_pieces(tokens.tolist())
+    seconds_per_frame = get_frame_shift(model) / sample_rate
+    return {
+        "transcription": model.ids_to_text(tokens.tolist()),
+        "words": word_timestamps(pieces, starts, ends, seconds_per_frame),
+        "tokens": token_timestamps(pieces, starts, ends, seconds_per_frame),
+    }
+
+def process_audio_frames(samples: np.ndarray, window_seconds: float = None, overlap_seconds: float = None, sample_rate: int = 16000) -> np.ndarray:
+    """Process 16 kHz mono float32 samples in overlapping windows and stitch them at frame level.
+
+    Overlap lets windows stay short (tens of seconds instead of the old 1800 s, which needed
+    ~8 GB of GPU memory) without cutting words at the seams, and lets one long file fill
+    the batch dimension. Window length, batch size and encoder settings come from the
+    profile autotuned for the request's duration bucket.
+    """
+    chunking_cfg = config.get("chunking", {})
+    profile = request_profile(samples, sample_rate)
+    if len(samples) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    vad_cfg = config.get("vad", {})
+    if vad_cfg.get("enabled", False):
+        max_segment = int(window_seconds * sample_rate) if window_seconds else vad_segment_samples(sample_rate)
+        return process_speech_segments(samples, max_segment, sample_rate, vad_cfg, profile)
+
+    if window_seconds is None:
+        window_seconds = get_window_seconds(profile)
+    if overlap_seconds is None:
+        overlap_seconds = chunking_cfg.get("overlap_seconds", 4)
+
+    window_size = int(window_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    windows = make_windows(len(samples), window_size, overlap)
+    logger.info(f"Samples: {samples.shape}, {len(windows)} window(s) of {window_seconds}s, {overlap_seconds}s overlap")
     
-    return " ".join(results)
+    # Windows go to the shared scheduler, which batches them with windows from other requests
+    futures = [submit_window(samples[start:end], profile) for start, end in windows]
+    frame_preds = [future.result() for future in futures]
+
+    with metrics.timed("stitch"):
+        return stitch_frames(frame_preds, windows, get_frame_shift(get_model()))
+
+def submit_speech_segments(samples: np.ndarray, max_segment_samples: int, sample_rate: int, vad_cfg: dict,
+                           profile: dict = None) -> Tuple[List[Tuple[int, int]], List[Future]]:
+    """Run VAD over ``samples`` and submit each speech segment without waiting for it.
+
+    Returns the (start, end) sample range of every segment, with starts rounded down to a frame
+    boundary, and one future per segment; ``speech_frames`` assembles the results.
+    """
+    frame_shift = get_frame_shift(get_model())
+    params = {k: v for k, v in vad_cfg.items() if k != "enabled"}
+    with metrics.timed("vad"):
+        segments = speech_segments(samples, sample_rate, max_segment_samples, **params)
+    speech = sum(end - start for start, end in segments)
+    segments = [(start - start % frame_shift, end) for start, end in segments]
+    metrics.record_silence((len(samples) - speech) / sample_rate)
+    logger.info(f"Samples: {samples.shape}, {len(segments)} speech segment(s), {speech / max(len(samples), 1):.0%} speech")
+
+    # Longest first, so the scheduler's batches group segments of similar length and pad less
+    order = sorted(range(len(segments)), key=lambda i: segments[i][0] - segments[i][1])
+    futures = {i: submit_window(samples[segments[i][0]:segments[i][1]], profile) for i in order}
+    return segments, [futures[i] for i in range(len(segments))]
+
+def speech_frames(num_samples: int, segments: List[Tuple[int, int]], segment_preds: List[np.ndarray]) -> np.ndarray:
+    """Lay each segment's frame predictions back on the original timeline; the rest is blank."""
+    model = get_model()
+    frame_shift = get_frame_shift(model)
+    frames = np.full(-(-num_samples // frame_shift), get_blank_id(model), dtype=np.int64)
+    for (start, _), preds in zip(segments, segment_preds):
+        first = start // frame_shift
+        count = min(len(preds), len(frames) - first)
+        frames[first:first + count] = preds[:count]
+    return frames
+
+def process_speech_segments(samples: np.ndarray, max_segment_samples: int, sample_rate: int, vad_cfg: dict,
+                            profile: dict = None) -> np.ndarray:
+    """Infer only the speech found by VAD and lay its frames back on the original timeline.
+
+    Segments are cut at pauses, so they need no overlap or stitching; silence between them
+    becomes blank frames. Segment starts are rounded down to a frame boundary so frame j still
+    covers samples from j * frame_shift, which keeps word timestamps exact.
+    """
+    segments, futures = submit_speech_segments(samples, max_segment_samples, sample_rate, vad_cfg, profile)
+    return speech_frames(len(samples), segments, [future.result() for future in futures])
+
+def process_audio_chunked(samples: np.ndarray, window_seconds: float = None, overlap_seconds: float = None, sample_rate: int = 16000) -> str:
+    frames = process_audio_frames(samples, window_seconds, overlap_seconds, sample_rate)
+    with metrics.timed("decode_ctc"):
+        return frames_to_text(frames)
+
+def transcribe_with_timestamps(samples: np.ndarray) -> dict:
+    frames = process_audio_frames(samples)
+    with metrics.timed("decode_ctc"):
+        return frames_to_timestamps(frames)
 
-def transcribe_audio(audio_data: bytes) -> str:
+def transcribe_audio(samples: np.ndarray) -> str:
     try:
-        transcription = process_audio_chunked(audio_data)
+        transcription = process_audio_chunked(samples)
         return transcription
     
     except Exception as e:
@@ -1,10 +1,25 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from src.inference import transcribe_audio
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, WebSocket
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import List
+from src.inference import transcribe_audio, transcribe_with_timestamps
+from src.batching import get_scheduler
 from src.config import config
-from src.preprocess import convert
+from src.preprocess import conversion_stats
+from src.pipeline import get_decode_stage
+from src.memory import get_memory_budget
+from src.cache import get_transcript_cache
+from src import redis_connect
+from src.warmup import warmup, skip_warmup, readiness
+from src.streaming import transcribe_stream
+from src.batch import is_archive, iter_archive, transcribe_batch
+from src.realtime import serve_stream
+from src.profiling import get_bucket_profiles, get_runtime_profile
+from src import metrics
 import asyncio
 import logging
+import tarfile
 import time
+import zipfile
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,29 +27,160 @@ logger = logging.getLogger(__name__)
 app = FastAPI()
 
 @app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
+async def transcribe(file: UploadFile = File(...), timestamps: bool = False):
+    """Transcribe an upload; with ``?timestamps=true`` also return word and token timings in seconds."""
     try:
-        audio_data = await file.read()
+        with metrics.timed("upload_read"):
+            audio_data = await file.read()
         logger.info(f"Received audio file: {file.filename}, Size: {len(audio_data)} bytes")
         
-        converted_audio_data, duration = await asyncio.to_thread(convert, audio_data)
+        # CPU stage (decode pool) feeds the GPU stage (batch scheduler); both are bounded
+        samples, duration = await get_decode_stage().decode(audio_data)
         logger.info("Audio conversion completed")
         
         start = time.time()
-        transcription = await asyncio.to_thread(transcribe_audio, converted_audio_data)
+        if timestamps:
+            result = await asyncio.to_thread(transcribe_with_timestamps, samples)
+        else:
+            result = {"transcription": await asyncio.to_thread(transcribe_audio, samples)}
         end = time.time()
         elapsed = end - start
         
         print(f"Duration: {duration }s")
         print(f'Elapsed: {elapsed}s')
         print(f'RTF: {elapsed/duration}')
+        metrics.record_request("transcribe", duration, elapsed)
 
-        return {"transcription": transcription}
+        return result
     
     except Exception as e:
         logger.error(f"Transcription failed: {str(e)}", exc_info=True)
+        metrics.record_failure("transcribe")
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
 
+@app.post("/transcribe/stream")
+async def transcribe_streaming(request: Request):
+    """Transcribe a raw request body while it uploads; windows are inferred as soon as they are decoded."""
+    try:
+        start = time.time()
+        transcription, duration = await transcribe_stream(request.stream())
+        elapsed = time.time() - start
+
+        logger.info(f"Streamed {duration:.2f}s of audio in {elapsed:.2f}s")
+        metrics.record_request("transcribe_stream", duration, elapsed)
+
+        return {"transcription": transcription}
+
+    except Exception as e:
+        logger.error(f"Streaming transcription failed: {str(e)}", exc_info=True)
+        metrics.record_failure("transcribe_stream")
+        raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+@app.post("/transcribe/batch")
+async def transcribe_many(files: List[UploadFile] = File(...)):
+    """Many clips in one request: multipart ``files``, any of which may be a zip/tar archive of clips.
+
+    Streams NDJSON: one line per clip as each length-bucketed batch finishes, then a summary line.
+    """
+    items = []
+    for upload in files:
+        data = await upload.read()
+        if is_archive(upload.filename):
+            try:
+                items.extend(await asyncio.to_thread(lambda: list(iter_archive(data, upload.filename))))
+            except (zipfile.BadZipFile, tarfile.TarError) as e:
+                raise HTTPException(status_code=400, detail=f"Could not read archive {upload.filename}: {e}")
+        else:
+            items.append((upload.filename, data))
+    logger.info(f"Batch request: {len(items)} file(s)")
+
+    lines = (line + "\n" async for line in transcribe_batch(items))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.websocket("/transcribe/realtime")
+async def transcribe_realtime(websocket: WebSocket):
+    """Live audio: send 16 kHz mono int16 PCM as binary messages, receive partial/final hypotheses."""
+    await serve_stream(websocket)
+
+@app.exception_handler(redis_connect.aioredis.RedisError)
+async def redis_unavailable(request: Request, exc: Exception):
+    logger.error(f"Redis error on {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": "Job queue unavailable"})
+
+@app.post("/jobs")
+async def submit_job(file: UploadFile = File(...)):
+    """Store the upload in Redis and queue it; poll GET /jobs/{job_id} for the result."""
+    audio_data = await file.read()
+    job_id = await redis_connect.create_job(audio_data, file.filename)
+    logger.info(f"Queued job {job_id}: {file.filename}, Size: {len(audio_data)} bytes")
+    return {"job_id": job_id, "status": "QUEUED"}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = await redis_connect.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"job_id": job_id, **job}
+
+@app.post("/jobs/status")
+async def jobs_status(job_ids: List[str]):
+    """Status (and transcription, when done) of many jobs in one call; unknown ids map to null."""
+    return await redis_connect.get_jobs(job_ids)
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving HTTP."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: model replicas are loaded and warmed up."""
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats")
+async def stats():
+    return {
+        "batching": get_scheduler().stats(),
+        "decode": get_decode_stage().stats(),
+        "conversion": conversion_stats(),
+        "memory": get_memory_budget().stats() if get_memory_budget() else None,
+        "cache": get_transcript_cache().stats() if get_transcript_cache() else None,
+        "runtime_profile": get_runtime_profile(),
+        "bucket_profiles": get_bucket_profiles(),
+    }
+
+worker_task = None
+warmup_task = None
+
+@app.on_event("startup")
+async def startup():
+    global worker_task, warmup_task
+    # Load and warm up in the background so /health answers while /ready reports progress
+    if config.get("warmup", {}).get("enabled", True):
+        warmup_task = asyncio.create_task(asyncio.to_thread(warmup))
+    else:
+        skip_warmup()
+    # Run the job worker next to the HTTP path so jobs and requests share the model and scheduler
+    if config.get("jobs", {}).get("in_process_worker", False):
+        try:
+            await redis_connect.connect_to_redis()
+            worker_task = asyncio.create_task(redis_connect.worker_loop())
+        except (redis_connect.aioredis.RedisError, OSError) as e:
+            # Transcription doesn't need Redis; only /jobs is unavailable until it is reachable
+            logger.warning(f"Redis unavailable, starting without the job worker (/jobs answers 503): {e}")
+
+@app.on_event("shutdown")
+async def shutdown():
+    if worker_task is not None:
+        worker_task.cancel()
+    get_decode_stage().shutdown()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host=config["server"]["host"], port=config["server"]["port"], reload=True)
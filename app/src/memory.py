@@ -0,0 +1,121 @@
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+import torch
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 ** 2
+
+
+class MemoryBudget:
+    """Keeps batches under a VRAM ceiling using learned peak memory per second of padded audio.
+
+    A batch of ``batch_size`` windows padded to ``seconds`` costs roughly
+    ``static + overhead[batch_size] + rate[batch_size] * batch_size * seconds``. ``static``
+    (weights, CUDA context) is read from the allocator. ``overhead`` (fixed activation and
+    workspace memory) and ``rate`` are fitted per batch size by least squares over recent
+    observed peaks, so short batches, where the fixed part dominates, don't inflate the rate.
+    The fit is shifted up to cover every observation, to stay conservative. Until a batch size
+    has peaks at two or more lengths, the profiling seed is used. The scheduler asks ``fits``
+    before growing a batch, and chunking asks ``choose_window_seconds`` for the window length.
+    """
+
+    def __init__(self, ceiling_bytes: int, seed_static_bytes: int, seed_bytes_per_second: float,
+                 window_options, max_observations: int = 64, min_spread_seconds: float = 1.0):
+        self.ceiling = ceiling_bytes
+        self.static = seed_static_bytes
+        self.seed_rate = seed_bytes_per_second
+        self.window_options = sorted(window_options)
+        self.max_observations = max_observations
+        # Padded lengths must differ by this much before a batch size gets its own fit
+        self.min_spread = min_spread_seconds
+        self.observations = {}
+        self.fits_by_batch = {}
+        self._lock = threading.Lock()
+        self._observations = 0
+        self._high_water = 0
+
+    def model(self, batch_size: int):
+        """(overhead bytes, bytes per padded second) for ``batch_size``."""
+        with self._lock:
+            if batch_size in self.fits_by_batch:
+                return self.fits_by_batch[batch_size]
+            # Fall back to the closest fitted batch size, then to the seed
+            if self.fits_by_batch:
+                closest = min(self.fits_by_batch, key=lambda b: abs(b - batch_size))
+                return self.fits_by_batch[closest]
+            return 0.0, self.seed_rate
+
+    def estimate(self, batch_size: int, seconds: float) -> float:
+        """Predicted peak bytes for a batch of ``batch_size`` windows padded to ``seconds``."""
+        overhead, rate = self.model(batch_size)
+        return self.static + overhead + rate * batch_size * seconds
+
+    def fits(self, batch_size: int, seconds: float) -> bool:
+        return self.estimate(batch_size, seconds) <= self.ceiling
+
+    def choose_window_seconds(self, batch_size: int) -> float:
+        """Longest window option for which a full batch of ``batch_size`` stays under the ceiling."""
+        for seconds in reversed(self.window_options):
+            if self.fits(batch_size, seconds):
+                return seconds
+        return self.window_options[0]
+
+    def _fit(self, batch_size: int):
+        points = self.observations[batch_size]
+        x = np.array([batch_size * seconds for seconds, _ in points])
+        y = np.array([extra for _, extra in points])
+        if x.max() - x.min() < self.min_spread * batch_size:
+            return None
+        rate, overhead = np.polyfit(x, y, 1)
+        rate = max(float(rate), 0.0)
+        # Shift the line up so it bounds every observed peak
+        overhead = max(float(np.max(y - rate * x)), 0.0)
+        return overhead, rate
+
+    def observe(self, batch_size: int, seconds: float, static_bytes: int, peak_bytes: int):
+        """Record the measured peak of one batch."""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.static = static_bytes
+            points = self.observations.setdefault(batch_size, deque(maxlen=self.max_observations))
+            points.append((seconds, max(peak_bytes - static_bytes, 0)))
+            fit = self._fit(batch_size)
+            if fit is not None:
+                self.fits_by_batch[batch_size] = fit
+            self._observations += 1
+            self._high_water = max(self._high_water, peak_bytes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ceiling_mb": self.ceiling / MIB,
+                "static_mb": self.static / MIB,
+                "seed_mb_per_second": self.seed_rate / MIB,
+                "learned": {b: {"overhead_mb": o / MIB, "mb_per_second": r / MIB}
+                            for b, (o, r) in sorted(self.fits_by_batch.items())},
+                "observations": self._observations,
+                "high_water_mb": self._high_water / MIB,
+            }
+
+
+memory_budget = None
+
+def get_memory_budget():
+    """The process-wide budget, or None when not running on CUDA."""
+    global memory_budget
+    if memory_budget is None and torch.cuda.is_available() and config.get("use_cuda", False):
+        memory_cfg = config.get("memory", {})
+        memory_budget = MemoryBudget(
+            ceiling_bytes=memory_cfg.get("vram_ceiling_mb", 14000) * MIB,
+            seed_static_bytes=memory_cfg.get("seed_static_mb", 2517) * MIB,
+            seed_bytes_per_second=memory_cfg.get("seed_mb_per_second", 3.22) * MIB,
+            window_options=memory_cfg.get("window_seconds_options", [20, 40, 60]),
+        )
+    return memory_budget
@@ -0,0 +1,107 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Stage latencies span sub-millisecond (stitching short files) to minutes (hour-long uploads)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+RTF_BUCKETS = (0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+
+STAGE_SECONDS = Histogram(
+    "transcribe_stage_seconds",
+    "Time spent in each stage of the transcription path",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+BATCH_SIZE = Histogram(
+    "inference_batch_size",
+    "Windows per batched forward pass",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64),
+)
+REQUEST_RTF = Histogram(
+    "transcribe_request_rtf",
+    "Real-time factor per request (processing seconds / audio seconds)",
+    ["endpoint"],
+    buckets=RTF_BUCKETS,
+)
+REQUESTS = Counter("transcribe_requests_total", "Transcription requests", ["endpoint", "status"])
+AUDIO_SECONDS = Counter("transcribe_audio_seconds_total", "Seconds of audio transcribed", ["endpoint"])
+SILENCE_SECONDS = Counter("vad_silence_seconds_total", "Seconds of audio skipped as non-speech by VAD")
+GPU_MEMORY_HIGH_WATER = Gauge(
+    "gpu_memory_high_water_bytes",
+    "Highest torch.cuda.max_memory_allocated seen during a batch",
+    ["device"],
+)
+QUEUE_DEPTH = Gauge("scheduler_queue_depth", "Windows waiting in the batch scheduler", ["replica"])
+REALTIME_STREAMS = Gauge("realtime_streams_active", "Open realtime WebSocket streams")
+PROFILE_REQUESTS = Counter("inference_profile_requests_total", "Requests routed to each duration-bucket profile",
+                           ["bucket"])
+
+# Pre-bound children: label lookup costs more than the observation itself on the hot path
+_stages = {}
+_endpoints = {}
+_high_water = {}
+
+
+def stage(name: str):
+    child = _stages.get(name)
+    if child is None:
+        child = _stages[name] = STAGE_SECONDS.labels(stage=name)
+    return child
+
+
+def observe_stage(name: str, seconds: float):
+    stage(name).observe(seconds)
+
+
+@contextmanager
+def timed(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage(name).observe(time.perf_counter() - start)
+
+
+def record_gpu_peak(device, peak_bytes: int):
+    key = str(device)
+    if peak_bytes > _high_water.get(key, 0):
+        _high_water[key] = peak_bytes
+        GPU_MEMORY_HIGH_WATER.labels(device=key).set(peak_bytes)
+
+
+def _endpoint(endpoint: str):
+    children = _endpoints.get(endpoint)
+    if children is None:
+        children = _endpoints[endpoint] = (
+            REQUESTS.labels(endpoint=endpoint, status="ok"),
+            AUDIO_SECONDS.labels(endpoint=endpoint),
+            REQUEST_RTF.labels(endpoint=endpoint),
+        )
+    return children
+
+
+def record_request(endpoint: str, audio_seconds: float, elapsed: float):
+    requests, audio, rtf = _endpoint(endpoint)
+    requests.inc()
+    audio.inc(audio_seconds)
+    if audio_seconds > 0:
+        rtf.observe(elapsed / audio_seconds)
+
+
+def record_silence(seconds: float):
+    SILENCE_SECONDS.inc(seconds)
+
+
+def record_profile(bucket: str):
+    PROFILE_REQUESTS.labels(bucket=bucket).inc()
+
+
+def record_failure(endpoint: str):
+    REQUESTS.labels(endpoint=endpoint, status="error").inc()
+
+
+def render():
+    """(body, content type) for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
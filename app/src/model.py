@@ -1,44 +1,126 @@
-import nemo.collections.asr as nemo_asr
+import torch
+from .backends import create_backend
 from .config import config
-from omegaconf import OmegaConf
+from .profiling import get_runtime_profile
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 model = None
+model_pool = None
+_pool_lock = threading.Lock()
 
-def initialize_model():
-    global model
-    if model is None:
-        model_name = config["model"]["name"]
-        logger.info(f"Initializing model: {model_name}")
+SNAPSHOT_CONFIG = "model_config.yaml"
+SNAPSHOT_WEIGHTS = "model_weights.ckpt"
+
+# Local attention span in encoder frames [left, right], unless the profiling results choose another
+ATTENTION_CONTEXT = [128, 128]
+
+def get_attention_context():
+    """Attention span the replicas run with; realtime streaming sizes its left context from it."""
+    context = get_runtime_profile().get("attention_context")
+    return [context, context] if context else ATTENTION_CONTEXT
+
+def get_subsampling_factor() -> int:
+    return get_runtime_profile().get("subsampling_factor", 1)  # 1 = auto select
+
+def encoder_settings(profile: dict = None):
+    """(attention context, subsampling factor) a batch runs with: the request's duration-bucket
+    profile where it sets them, otherwise the replica defaults."""
+    profile = profile or {}
+    context = profile.get("attention_context")
+    return ([context, context] if context else get_attention_context(),
+            profile.get("subsampling_factor") or get_subsampling_factor())
+
+def snapshot_available(snapshot_dir) -> bool:
+    return bool(snapshot_dir) and os.path.isfile(os.path.join(snapshot_dir, SNAPSHOT_CONFIG)) \
+        and os.path.isfile(os.path.join(snapshot_dir, SNAPSHOT_WEIGHTS))
+
+def load_snapshot(snapshot_dir: str, device: str):
+    """Build the model from a pre-extracted snapshot (see tools/export_snapshot.py), skipping the .nemo unpack."""
+    import nemo.collections.asr as nemo_asr
+    from omegaconf import OmegaConf
+    cfg = OmegaConf.load(os.path.join(snapshot_dir, SNAPSHOT_CONFIG))
+    replica = nemo_asr.models.EncDecCTCModel(cfg=cfg)
+    # mmap avoids reading the whole checkpoint up front
+    state_dict = torch.load(os.path.join(snapshot_dir, SNAPSHOT_WEIGHTS), map_location=device, mmap=True)
+    replica.load_state_dict(state_dict)
+    return replica
+
+def load_model(device: str = "cpu"):
+    """Load and configure one replica of the NeMo model on ``device``."""
+    import nemo.collections.asr as nemo_asr
+    from omegaconf import OmegaConf
+    model_name = config["model"]["name"]
+    snapshot_dir = config["model"].get("snapshot_dir")
+    logger.info(f"Initializing model: {model_name} on {device}")
 
-        try:
+    try:
+        start = time.time()
+        if snapshot_available(snapshot_dir):
+            replica = load_snapshot(snapshot_dir, device)
+            logger.info(f"Model loaded from snapshot {snapshot_dir} in {time.time() - start:.2f}s")
+        else:
             # Load the model without any config overrides initially
-            model = nemo_asr.models.EncDecCTCModel.from_pretrained(model_name)
-            logger.info("Model loaded successfully")
+            replica = nemo_asr.models.EncDecCTCModel.from_pretrained(model_name, map_location=torch.device(device))
+            logger.info(f"Model loaded successfully in {time.time() - start:.2f}s")
 
-            # Now apply the decoding strategy
-            decoding_cfg = OmegaConf.create({
-                "strategy": config['model']['decoding_strategy'],
-            })
-            model.change_decoding_strategy(decoding_cfg)
-            logger.info(f"Decoding strategy applied: {config['model']['decoding_strategy']}")
+        # Now apply the decoding strategy
+        decoding_cfg = OmegaConf.create({
+            "strategy": config['model']['decoding_strategy'],
+        })
+        replica.change_decoding_strategy(decoding_cfg)
+        logger.info(f"Decoding strategy applied: {config['model']['decoding_strategy']}")
 
-            # Apply other model-specific configurations
-            model.change_attention_model("rel_pos_local_attn", [128, 128])
-            model.change_subsampling_conv_chunking_factor(1)  # 1 = auto select
+        # Apply other model-specific configurations
+        replica.change_attention_model("rel_pos_local_attn", get_attention_context())
+        replica.change_subsampling_conv_chunking_factor(get_subsampling_factor())
 
-            model.eval()
-            
-            if config.get('use_cuda', False):
-                model = model.cuda()
+        replica.eval()
+        replica = replica.to(device)
 
-        except Exception as e:
-            logger.error(f"Error loading model: {str(e)}")
-            raise
+    except Exception as e:
+        logger.error(f"Error loading model: {str(e)}")
+        raise
 
+    return replica
+
+def replica_devices():
+    """One device per visible GPU when use_cuda is set, otherwise ``cpu_replicas`` CPU replicas."""
+    if config.get('use_cuda', False) and torch.cuda.is_available():
+        count = torch.cuda.device_count()
+        max_replicas = config.get('max_gpu_replicas')
+        if max_replicas:
+            count = min(count, max_replicas)
+        return [f"cuda:{i}" for i in range(count)]
+    return ["cpu"] * config.get('cpu_replicas', 1)
+
+def get_model_pool():
+    """All loaded replicas as (device, backend) pairs; the first one doubles as ``model``.
+
+    Replicas are ASRBackend instances (see src/backends.py), chosen by ``model.backend``.
+    """
+    global model, model_pool
+    with _pool_lock:
+        if model_pool is None:
+            model_pool = [(device, create_backend(device)) for device in replica_devices()]
+            model = model_pool[0][1]
+            logger.info(f"Model pool ready: {[device for device, _ in model_pool]}")
+    return model_pool
+
+def initialize_model():
+    get_model_pool()
     return model
 
 def get_model():
     return initialize_model()
+
+def get_frame_shift(model) -> int:
+    """Number of input samples per CTC output frame."""
+    return model.frame_shift
+
+def get_blank_id(model) -> int:
+    return model.blank_id
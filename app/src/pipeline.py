@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import metrics
+from .config import config
+from .preprocess import convert_audio, init_worker, record_conversion
+
+logger = logging.getLogger(__name__)
+
+
+class DecodeStage:
+    """CPU stage: decodes/resamples uploads in a process pool ahead of the GPU stage.
+
+    Decoding and resampling are CPU-bound, so they run in worker processes. At most
+    ``max_pending`` uploads are admitted at once; further requests wait here, which keeps
+    memory bounded and pushes back on clients when the GPU falls behind.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._completed = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: workers must not inherit the CUDA context or the scheduler thread
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=init_worker)
+                logger.info(f"Started decode pool with {self.workers} worker(s)")
+            return self._pool
+
+    async def decode(self, audio_bytes: bytes):
+        """Returns (samples, duration in seconds) once a worker has converted the upload."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+
+        self._waiting += 1
+        wait_start = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        metrics.observe_stage("decode_wait", time.perf_counter() - wait_start)
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            samples, duration, report = await loop.run_in_executor(self._get_pool(), convert_audio, audio_bytes)
+            elapsed = time.perf_counter() - start
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+        # convert runs in the worker; the rest is shipping bytes in and the waveform back
+        convert_seconds = report[1]
+        metrics.observe_stage("convert", convert_seconds)
+        metrics.observe_stage("waveform_load", max(elapsed - convert_seconds, 0.0))
+
+        record_conversion(report)
+        self._completed += 1
+        return samples, duration
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "completed": self._completed,
+        }
+
+
+decode_stage = None
+
+def get_decode_stage() -> DecodeStage:
+    global decode_stage
+    if decode_stage is None:
+        pipeline_cfg = config.get("pipeline", {})
+        decode_stage = DecodeStage(
+            workers=pipeline_cfg.get("decode_workers", os.cpu_count() or 1),
+            max_pending=pipeline_cfg.get("max_pending_decodes", 8),
+        )
+    return decode_stage
@@ -1,33 +1,138 @@
-import os
 import io
-from pydub import AudioSegment
+import time
+import logging
+import functools
+import subprocess
+import threading
+import numpy as np
+import soundfile as sf
+import torch
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+# Running totals so the savings of the fast path can be reported per request
+_stats_lock = threading.Lock()
+_stats = {
+    "fast_path": {"requests": 0, "seconds": 0.0, "audio_seconds": 0.0, "bytes_copied": 0},
+    "resample": {"requests": 0, "seconds": 0.0, "audio_seconds": 0.0, "bytes_copied": 0},
+    "transcode": {"requests": 0, "seconds": 0.0, "audio_seconds": 0.0, "bytes_copied": 0},
+}
+
+
+def record_conversion(report):
+    """Add one conversion report (from convert_audio) to the running totals and log it."""
+    path, elapsed, duration, bytes_copied = report
+    with _stats_lock:
+        entry = _stats[path]
+        entry["requests"] += 1
+        entry["seconds"] += elapsed
+        entry["audio_seconds"] += duration
+        entry["bytes_copied"] += bytes_copied
+
+        # Estimate what the transcode path would have cost for the same amount of audio
+        transcode = _stats["transcode"]
+        saved = 0.0
+        if path != "transcode" and transcode["audio_seconds"] > 0:
+            saved = transcode["seconds"] / transcode["audio_seconds"] * duration - elapsed
+
+    logger.info(f"convert: {path}, {elapsed * 1000:.1f} ms, {bytes_copied} bytes copied, "
+                f"~{saved * 1000:.1f} ms saved vs transcode")
+
+
+def conversion_stats():
+    with _stats_lock:
+        return {path: dict(entry) for path, entry in _stats.items()}
+
+
+def is_native_pcm(info):
+    """True if the container already holds 16 kHz mono 16-bit PCM the model can take as-is."""
+    return (info.format in ("WAV", "FLAC")
+            and info.samplerate == TARGET_SAMPLE_RATE
+            and info.channels == 1
+            and info.subtype == "PCM_16")
+
+
+def _read_native(audio_bytes):
+    samples, _ = sf.read(io.BytesIO(audio_bytes), dtype="float32")
+    return samples
+
+
+def init_worker():
+    """Decode workers run side by side, one upload each; one torch thread apiece avoids oversubscription."""
+    torch.set_num_threads(1)
+
+
+@functools.lru_cache(maxsize=None)
+def _resampler(source_rate):
+    """Polyphase resampling kernel for one source rate, built once per process."""
+    import torchaudio
+    return torchaudio.transforms.Resample(source_rate, TARGET_SAMPLE_RATE)
+
+
+def _read_resampled(audio_bytes):
+    """Decode anything soundfile reads (WAV, FLAC, OGG, MP3) once, then downmix and resample
+    the float32 array in-process instead of round-tripping through AudioSegment bytes."""
+    data, rate = sf.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=True)
+    bytes_copied = data.nbytes
+
+    if data.shape[1] > 1:
+        samples = data.mean(axis=1, dtype=np.float32)
+        bytes_copied += samples.nbytes
+    else:
+        samples = data[:, 0]
+    del data
+
+    if rate != TARGET_SAMPLE_RATE:
+        with torch.no_grad():
+            samples = _resampler(rate)(torch.from_numpy(np.ascontiguousarray(samples))).numpy()
+        bytes_copied += samples.nbytes
+    return samples, bytes_copied
+
+
+def _transcode(audio_bytes):
+    """Containers soundfile can't read (m4a, webm, ...): one ffmpeg pass straight to 16 kHz mono float32."""
+    proc = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "f32le", "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "pipe:1"],
+        input=audio_bytes, capture_output=True, check=False,
+    )
+    if proc.returncode != 0:
+        raise ValueError(f"ffmpeg could not decode the upload: {proc.stderr.decode(errors='replace').strip()}")
+    samples = np.frombuffer(proc.stdout, dtype=np.float32)
+    return samples, samples.nbytes
+
+
+def convert_audio(audio_bytes):
+    """Decode an upload to 16 kHz mono float32 samples without touching the shared stats.
+
+    Safe to run in a worker process. Returns (samples, duration in seconds, report), where
+    report is passed to record_conversion in the parent.
+    """
+    start = time.perf_counter()
+
+    try:
+        info = sf.info(io.BytesIO(audio_bytes))
+    except RuntimeError:
+        info = None
+
+    if info is not None and is_native_pcm(info):
+        samples = _read_native(audio_bytes)
+        path, bytes_copied = "fast_path", samples.nbytes
+    elif info is not None:
+        samples, bytes_copied = _read_resampled(audio_bytes)
+        path = "resample"
+    else:
+        samples, bytes_copied = _transcode(audio_bytes)
+        path = "transcode"
+
+    duration = len(samples) / TARGET_SAMPLE_RATE
+    return samples, duration, (path, time.perf_counter() - start, duration, bytes_copied)
 
 
 def convert(audio_bytes):
-    audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-#    dir_name = 'data/formats'
-#
-#    for filename in os.listdir(dir_name):
-#        path = os.path.join(dir_name, filename)
-#        audio = AudioSegment.from_file(path)
-#
-    print(f"{audio.channels} channel(s), {audio.frame_rate} Hz, {audio.sample_width * 8} bit, {audio.frame_count()} frames")
-    # enforce single channel
-    if audio.channels > 1:
-        print('converting to mono')
-        audio = audio.set_channels(1)
-    
-    # Convert to 16-bit PCM
-    audio = audio.set_sample_width(2)
-    
-    # Convert to 16kHz sample rate
-    audio = audio.set_frame_rate(16000)
-    
-    # Export as wav
-    buffer = io.BytesIO()
-    audio.export(buffer, format="wav")
-    
-    return buffer.getvalue(), len(audio)/ 1000.0
-
-#if __name__ == "__main__":
-#    main()
+    """Decode an upload to 16 kHz mono float32 samples. Returns (samples, duration in seconds)."""
+    samples, duration, report = convert_audio(audio_bytes)
+    record_conversion(report)
+    return samples, duration
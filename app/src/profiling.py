@@ -0,0 +1,374 @@
+import os
+import json
+import time
+import logging
+import resource
+import itertools
+import threading
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from .config import config
+from .stitching import make_windows
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 ** 2
+
+# Sweep axes; a results row holds one value of each plus the clip duration it was measured on
+SETTING_KEYS = ("attention_context", "subsampling_factor", "batch_size", "window_seconds", "precision")
+
+# A duration bucket only leaves the default setting for one at least this much faster (relative RTF)
+BUCKET_RTF_TOLERANCE = 0.05
+
+
+def _proc_status_kb(field: str):
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class MemoryProbe:
+    """Peak memory over a run: caching-allocator stats on CUDA, resident set size on CPU.
+
+    On CUDA the allocator's peak counters are read after every batch (forward_batch resets
+    them per batch for the memory budget), so the probe keeps the running maximum. On CPU the
+    kernel's RSS high-water mark is reset through /proc/self/clear_refs where Linux allows it;
+    elsewhere the peak is the process's lifetime maximum.
+    """
+
+    def __init__(self, device):
+        self.device = torch.device(device)
+
+    def start(self):
+        self.peak_allocated = self.peak_reserved = 0
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+            torch.cuda.reset_peak_memory_stats(self.device)
+            stats = torch.cuda.memory_stats(self.device)
+            self._retries = stats.get("num_alloc_retries", 0)
+            self._ooms = stats.get("num_ooms", 0)
+        else:
+            try:
+                with open("/proc/self/clear_refs", "w") as f:
+                    f.write("5")  # resets VmHWM
+            except OSError:
+                pass
+
+    def sample(self):
+        if self.device.type == "cuda":
+            stats = torch.cuda.memory_stats(self.device)
+            self.peak_allocated = max(self.peak_allocated, stats.get("allocated_bytes.all.peak", 0))
+            self.peak_reserved = max(self.peak_reserved, stats.get("reserved_bytes.all.peak", 0))
+
+    def result(self) -> Dict:
+        if self.device.type == "cuda":
+            self.sample()
+            stats = torch.cuda.memory_stats(self.device)
+            return {
+                "peak_mb": self.peak_allocated / MIB,
+                "reserved_mb": self.peak_reserved / MIB,
+                "alloc_retries": stats.get("num_alloc_retries", 0) - self._retries,
+                "ooms": stats.get("num_ooms", 0) - self._ooms,
+            }
+        peak_kb = _proc_status_kb("VmHWM") or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"peak_mb": peak_kb / 1024, "rss_mb": (_proc_status_kb("VmRSS") or 0) / 1024}
+
+
+def noise(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """Reproducible white noise; the encoder's cost doesn't depend on what is said."""
+    return np.random.default_rng(seed).standard_normal(int(seconds * sample_rate)).astype(np.float32) * 0.1
+
+
+def workload(duration: float, window_seconds: float, overlap_seconds: float, batch_size: int,
+             sample_rate: int = 16000) -> Tuple[List[List[np.ndarray]], float]:
+    """Batches the server would run for clips of ``duration``, and the audio seconds they cover.
+
+    A clip longer than one window is split into overlapping windows, as chunked inference
+    does. When a clip has fewer windows than ``batch_size``, copies of it stand in for
+    concurrent requests of the same length, so every batch is full.
+    """
+    audio = noise(duration, sample_rate)
+    windows = [audio[start:end] for start, end in make_windows(
+        len(audio), int(window_seconds * sample_rate), int(overlap_seconds * sample_rate))]
+    clips = max(1, -(-batch_size // len(windows)))
+    windows = windows * clips
+    return [windows[i:i + batch_size] for i in range(0, len(windows), batch_size)], duration * clips
+
+
+def _run(backend, batches, settings, probe=None):
+    from .batching import forward_batch  # imports the model pool; keep it out of server-side settings loading
+    for batch in batches:
+        forward_batch(backend, batch, settings)
+        if probe is not None:
+            probe.sample()
+    if backend.device.type == "cuda":
+        torch.cuda.synchronize(backend.device)
+
+
+def _trace(backend, batches, settings, path: str):
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if backend.device.type == "cuda":
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    with torch.profiler.profile(activities=activities, record_shapes=True, profile_memory=True) as prof:
+        _run(backend, batches, settings)
+    prof.export_chrome_trace(path)
+
+
+def measure(backend, settings: Dict, duration: float, overlap_seconds: float, repeats: int = 1,
+            trace_dir: str = None) -> Dict:
+    """One results row: median wall time of ``repeats`` runs of the workload, and peak memory.
+
+    With ``trace_dir``, one more run is recorded with torch.profiler and written as a Chrome
+    trace (open in chrome://tracing or Perfetto); it is kept out of the timings.
+    """
+    row = {**settings, "duration": duration}
+    batches, audio_seconds = workload(duration, settings["window_seconds"], overlap_seconds,
+                                      settings["batch_size"], backend.sample_rate)
+    probe = MemoryProbe(backend.device)
+    try:
+        _run(backend, batches[:1], settings)  # switches the encoder; cuDNN autotuning and allocator growth for this shape
+        times = []
+        probe.start()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _run(backend, batches, settings, probe)
+            times.append(time.perf_counter() - start)
+        row.update(probe.result())
+        row.update(seconds=float(np.median(times)), audio_seconds=audio_seconds,
+                   rtf=float(np.median(times)) / audio_seconds, error=None)
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+            name = "_".join(f"{k}-{settings[k]}" for k in SETTING_KEYS) + f"_duration-{duration:g}.json"
+            row["trace"] = os.path.join(trace_dir, name)
+            _trace(backend, batches, settings, row["trace"])
+    except torch.cuda.OutOfMemoryError:
+        row.update(error="oom")
+    finally:
+        if backend.device.type == "cuda":
+            torch.cuda.empty_cache()
+    return row
+
+
+def sweep(device: str, grid: Dict[str, Sequence], durations: Sequence[float], backend_name: str = None,
+          overlap_seconds: float = None, repeats: int = 1, trace_dir: str = None) -> Iterator[Dict]:
+    """Rows for every combination of ``grid`` (one list per SETTING_KEYS entry) and clip duration.
+
+    A backend is built once per precision; attention context and subsampling are switched on
+    the loaded model by forward_batch, as the server does per batch. Backends without those knobs (see ``ASRBackend.configure_encoder``) are
+    swept over the first value of each only.
+    """
+    from .backends import create_backend
+    if overlap_seconds is None:
+        overlap_seconds = config.get("chunking", {}).get("overlap_seconds", 4)
+    too_short = [w for w in grid["window_seconds"] if w <= overlap_seconds]
+    if too_short:
+        raise ValueError(f"Window lengths {too_short}s are not longer than the {overlap_seconds}s overlap")
+
+    for precision in grid["precision"]:
+        backend = create_backend(device, precision, name=backend_name)
+        contexts, factors = grid["attention_context"], grid["subsampling_factor"]
+        if not backend.encoder_configurable:
+            contexts, factors = contexts[:1], factors[:1]
+        for context, factor in itertools.product(contexts, factors):
+            for batch_size, window_seconds in itertools.product(grid["batch_size"], grid["window_seconds"]):
+                settings = {"attention_context": context, "subsampling_factor": factor, "batch_size": batch_size,
+                            "window_seconds": window_seconds, "precision": precision}
+                for duration in durations:
+                    yield measure(backend, settings, duration, overlap_seconds, repeats, trace_dir)
+        del backend
+
+
+def write_results(path: str, rows: List[Dict], device: str, backend_name: str):
+    """The results table: every measured row (tools/autotune.py later adds duration-bucket profiles)."""
+    device = torch.device(device)
+    save_results(path, {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": backend_name,
+        "device_type": device.type,
+        "device_name": torch.cuda.get_device_name(device) if device.type == "cuda" else "cpu",
+        "rows": rows,
+    })
+
+
+def save_results(path: str, table: Dict):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(table, f, indent=2)
+
+
+def load_results(path: str) -> Dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def min_attention_context() -> int:
+    """Narrowest attention context a profile may use: ``profiling.min_attention_context``, else
+    the model's default span. A narrower span loses accuracy, not only time, so RTF alone
+    must not pick it."""
+    from .model import ATTENTION_CONTEXT  # src.model imports this module
+    return config.get("profiling", {}).get("min_attention_context") or ATTENTION_CONTEXT[0]
+
+
+def choose_settings(rows: List[Dict], precision: str = None, max_peak_mb: float = None,
+                    min_context: int = None) -> Dict:
+    """The setting with the lowest overall RTF across its durations.
+
+    Settings that failed (e.g. ran out of memory) on any duration, peaked above
+    ``max_peak_mb`` or attend over fewer than ``min_context`` frames (default:
+    ``min_attention_context()``) are skipped. Returns {} when nothing qualifies.
+    """
+    if min_context is None:
+        min_context = min_attention_context()
+    groups = {}
+    for row in rows:
+        if (precision is None or row["precision"] == precision) and row["attention_context"] >= min_context:
+            groups.setdefault(tuple(row[k] for k in SETTING_KEYS), []).append(row)
+
+    best = {}
+    for key, group in groups.items():
+        if any(r.get("error") for r in group):
+            continue
+        peak = max(r["peak_mb"] for r in group)
+        if max_peak_mb is not None and peak > max_peak_mb:
+            continue
+        rtf = sum(r["seconds"] for r in group) / sum(r["audio_seconds"] for r in group)
+        if not best or rtf < best["rtf"]:
+            best = {**dict(zip(SETTING_KEYS, key)), "rtf": rtf, "peak_mb": peak}
+    return best
+
+
+def fit_memory_seed(rows: List[Dict]):
+    """Least-squares ``peak = static + rate * batch_size * window_seconds`` over CUDA rows, as
+    (static MiB, MiB per padded second) for the ``memory`` section of config.yml, or None."""
+    points = [(r["batch_size"] * r["window_seconds"], r["peak_mb"]) for r in rows
+              if not r.get("error") and "reserved_mb" in r]
+    if len({x for x, _ in points}) < 2:
+        return None
+    x, y = np.array(points, dtype=np.float64).T
+    rate, static = np.polyfit(x, y, 1)
+    return float(static), float(rate)
+
+
+def bucket_profiles(rows: List[Dict], precision: str, max_peak_mb: float = None,
+                    rtf_tolerance: float = BUCKET_RTF_TOLERANCE) -> List[Dict]:
+    """Best setting per measured clip duration, as duration buckets for request routing.
+
+    Bucket ``i`` covers durations up to its ``max_duration`` (the duration it was measured on);
+    clips longer than the last bucket use the last one. Candidates are filtered as in
+    ``choose_settings``. A bucket keeps the overall default setting unless another one is more
+    than ``rtf_tolerance`` faster on that duration: below every swept window, window length
+    and context differ by timing noise only, and switching settings per bucket also splits
+    the scheduler's batches.
+    """
+    default = choose_settings(rows, precision, max_peak_mb)
+    default_key = tuple(default.get(k) for k in SETTING_KEYS)
+    buckets = []
+    for duration in sorted({r["duration"] for r in rows}):
+        at_duration = [r for r in rows if r["duration"] == duration]
+        chosen = choose_settings(at_duration, precision, max_peak_mb)
+        if not chosen:
+            continue
+        baseline = choose_settings([r for r in at_duration if tuple(r[k] for k in SETTING_KEYS) == default_key],
+                                   precision, max_peak_mb)
+        if baseline and baseline["rtf"] <= chosen["rtf"] * (1 + rtf_tolerance):
+            chosen = baseline
+        buckets.append({"max_duration": duration, **chosen})
+    return buckets
+
+# Tables are re-read when their file changes (checked at most this often), so a new autotune
+# run takes effect without a restart
+RELOAD_CHECK_SECONDS = 5.0
+
+_runtime_lock = threading.Lock()
+_runtime = {"checked": None, "mtime": None, "default": {}, "buckets": []}
+
+
+def _runtime_table() -> Dict:
+    profiling_cfg = config.get("profiling", {})
+    path = profiling_cfg.get("results_path")
+    with _runtime_lock:
+        now = time.monotonic()
+        if _runtime["checked"] is not None and now - _runtime["checked"] < RELOAD_CHECK_SECONDS:
+            return _runtime
+        _runtime["checked"] = now
+        usable = profiling_cfg.get("apply", True) and path and os.path.isfile(path)
+        mtime = os.path.getmtime(path) if usable else None
+        if mtime != _runtime["mtime"]:
+            _runtime.update(mtime=mtime, **(_load_runtime_profiles(path) if usable else {"default": {}, "buckets": []}))
+        return _runtime
+
+
+def get_runtime_profile() -> Dict:
+    """Default settings the server runs with, chosen from the results table at ``profiling.results_path``.
+
+    Only rows measured with the configured backend on the same kind of device and at the
+    configured precision count, and none narrower than ``min_attention_context()``: precision
+    and attention context change accuracy as well as speed (tools/accuracy_gate.py checks
+    precision), so the sweep never lowers either on RTF alone. Keys: attention_context,
+    subsampling_factor, batch_size, window_seconds; {} when there is no usable table or
+    ``profiling.apply`` is off.
+    """
+    return _runtime_table()["default"]
+
+
+def get_bucket_profiles() -> List[Dict]:
+    return _runtime_table()["buckets"]
+
+
+def profile_for_duration(seconds: float) -> Dict:
+    """The autotuned profile for a request of ``seconds`` (see tools/autotune.py), falling back
+    to the default profile when the table has no duration buckets."""
+    buckets = get_bucket_profiles()
+    if not buckets:
+        return get_runtime_profile()
+    for bucket in buckets:
+        if seconds <= bucket["max_duration"]:
+            return bucket
+    return buckets[-1]
+
+
+def _profile(settings: Dict) -> Dict:
+    return {k: settings[k] for k in SETTING_KEYS if k != "precision"}
+
+
+def _load_runtime_profiles(path: str) -> Dict:
+    table = load_results(path)
+    device_type = "cuda" if config.get("use_cuda", False) and torch.cuda.is_available() else "cpu"
+    backend_name = config["model"].get("backend", "nemo")
+    precision = config.get("precision", "fp32")
+    if table.get("device_type") != device_type or table.get("backend") != backend_name:
+        logger.warning(f"Ignoring {path}: profiled {table.get('backend')} on {table.get('device_type')}, "
+                       f"serving {backend_name} on {device_type}")
+        return {"default": {}, "buckets": []}
+
+    # Windows must outlast the overlap (see make_windows); the table may predate an overlap change
+    overlap_seconds = config.get("chunking", {}).get("overlap_seconds", 4)
+    rows = [r for r in table["rows"] if r["window_seconds"] > overlap_seconds]
+    if len(rows) < len(table["rows"]):
+        logger.warning(f"Ignoring {len(table['rows']) - len(rows)} row(s) of {path} with windows "
+                       f"not longer than the {overlap_seconds}s overlap")
+
+    max_peak_mb = config.get("memory", {}).get("vram_ceiling_mb") if device_type == "cuda" else None
+    chosen = choose_settings(rows, precision, max_peak_mb)
+    if not chosen:
+        logger.warning(f"No setting in {path} fits precision {precision}, the memory ceiling "
+                       f"and attention context >= {min_attention_context()}")
+        return {"default": {}, "buckets": []}
+    buckets = []
+    for i, bucket in enumerate(table.get("buckets", {}).get(precision, [])):
+        if bucket["window_seconds"] <= overlap_seconds:
+            bucket = {**bucket, **_profile(chosen)}  # route it with the default profile instead
+        low = buckets[-1]["max_duration"] if buckets else 0
+        last = i == len(table["buckets"][precision]) - 1
+        label = f"{low:g}s+" if last and buckets else f"{low:g}-{bucket['max_duration']:g}s"
+        buckets.append({"bucket": label, "max_duration": bucket["max_duration"], **_profile(bucket)})
+    logger.info(f"Runtime settings from {path}: {chosen}; {len(buckets)} duration bucket(s)")
+    return {"default": _profile(chosen), "buckets": buckets}
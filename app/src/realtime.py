@@ -0,0 +1,214 @@
+import json
+import asyncio
+import logging
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from . import metrics
+from .batching import get_scheduler
+from .config import config
+from .decoding import word_timestamps
+from .inference import decode_frames
+from .model import get_attention_context, get_model, get_frame_shift, get_blank_id
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+_streams_lock = threading.Lock()
+_open_streams = 0
+
+
+class RealtimeStream:
+    """Incremental CTC transcription of one live stream of 16 kHz audio.
+
+    Every ``step_seconds`` of new audio, the encoder runs over the uncommitted audio plus up to
+    ``left_context_seconds`` of already-committed audio before it (by default the local
+    attention's left span, ``get_attention_context()[0]`` frames). parakeet isn't cache-aware, so the
+    left context is cached as audio and re-encoded rather than as encoder states; capping it at
+    the attention span keeps the cost per step constant however long the stream runs.
+
+    Frames more than ``lookahead_seconds`` from the end of the received audio have enough right
+    context to be committed; the rest are provisional and only shape the partial hypothesis.
+    A run of ``endpoint_blank_seconds`` of committed blank frames ends an utterance: its text is
+    sent as a final hypothesis and a new segment begins.
+    """
+
+    def __init__(self, frame_shift: int, blank_id: int, step_seconds: float = 0.64,
+                 left_context_seconds: float = None, lookahead_seconds: float = 1.28,
+                 endpoint_blank_seconds: float = 0.8):
+        self.frame_shift = frame_shift
+        self.blank_id = blank_id
+        self.step = int(step_seconds * SAMPLE_RATE)
+        left = get_attention_context()[0] * frame_shift if left_context_seconds is None else left_context_seconds * SAMPLE_RATE
+        self.left_context = int(left) // frame_shift * frame_shift
+        self.lookahead = int(lookahead_seconds * SAMPLE_RATE) // frame_shift * frame_shift
+        self.endpoint_frames = max(1, int(endpoint_blank_seconds * SAMPLE_RATE / frame_shift))
+
+        self.audio = np.zeros(0, dtype=np.float32)
+        self.audio_start = 0  # sample offset of audio[0]; always a multiple of frame_shift
+        self.received = 0
+        self.committed = 0  # samples whose frames are final
+        self.last_inferred = 0
+        self.inferred_end = 0  # end sample of the window behind the latest hypothesis
+        self.segment_start = 0  # sample offset of the current utterance's first frame
+        self.segment = np.zeros(0, dtype=np.int64)  # committed frames of the current utterance
+        self.provisional = np.zeros(0, dtype=np.int64)
+
+    def append(self, pcm: bytes):
+        """Add little-endian int16 PCM."""
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        self.audio = np.concatenate((self.audio, samples))
+        self.received += len(samples)
+
+    def ready(self, final: bool = False) -> bool:
+        if final:
+            return self.received > self.committed
+        # Nothing may be committable yet (all within the lookahead), but a provisional partial
+        # after the first step is what keeps first-token latency low
+        return self.received - self.last_inferred >= self.step
+
+    def next_window(self):
+        """(samples, window start, window end): left context plus everything not yet committed."""
+        start = max(self.audio_start, self.committed - self.left_context)
+        end = self.received
+        self.last_inferred = end
+        return self.audio[start - self.audio_start:end - self.audio_start], start, end
+
+    def update(self, preds: np.ndarray, start: int, end: int, final: bool = False) -> List[Dict]:
+        """Commit what has enough right context and return the messages to send."""
+        self.inferred_end = end
+        first = (self.committed - start) // self.frame_shift
+        if final:
+            stable = preds[first:]
+            self.provisional = np.zeros(0, dtype=np.int64)
+        else:
+            last = max(first, (end - self.lookahead - start) // self.frame_shift)
+            stable = preds[first:last]
+            self.provisional = np.asarray(preds[last:], dtype=np.int64)
+        self.segment = np.concatenate((self.segment, stable))
+        self.committed = end if final else self.committed + len(stable) * self.frame_shift
+
+        # Only the left context of the next window needs to stay in memory
+        keep_from = max(self.audio_start, self.committed - self.left_context)
+        self.audio = self.audio[keep_from - self.audio_start:]
+        self.audio_start = keep_from
+
+        messages = []
+        trailing_blanks = len(self.segment) - len(np.trim_zeros(self.segment != self.blank_id, "b"))
+        has_speech = trailing_blanks < len(self.segment)
+        if has_speech and (final or trailing_blanks >= self.endpoint_frames):
+            messages.append(self._final())
+        elif not final:
+            if not has_speech and trailing_blanks >= self.endpoint_frames:
+                self._new_segment()  # nothing said yet; don't let leading silence pile up
+            messages.append(self._partial())
+        return messages
+
+    def _new_segment(self):
+        self.segment_start = self.committed
+        self.segment = np.zeros(0, dtype=np.int64)
+
+    def _partial(self) -> Dict:
+        model = get_model()
+        tokens, _, _ = decode_frames(np.concatenate((self.segment, self.provisional)))
+        return {
+            "type": "partial",
+            "text": model.ids_to_text(tokens.tolist()),
+            "start": self.segment_start / SAMPLE_RATE,
+            "audio_seconds": self.inferred_end / SAMPLE_RATE,
+        }
+
+    def _final(self) -> Dict:
+        model = get_model()
+        tokens, starts, ends = decode_frames(self.segment)
+        offset = self.segment_start // self.frame_shift
+        message = {
+            "type": "final",
+            "text": model.ids_to_text(tokens.tolist()),
+            "start": self.segment_start / SAMPLE_RATE,
+            "end": self.committed / SAMPLE_RATE,
+            "words": word_timestamps(model.ids_to_pieces(tokens.tolist()), starts + offset, ends + offset,
+                                     self.frame_shift / SAMPLE_RATE),
+            "audio_seconds": self.inferred_end / SAMPLE_RATE,
+        }
+        self._new_segment()
+        return message
+
+
+def _open_stream() -> bool:
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= config.get("realtime", {}).get("max_streams", 64):
+            return False
+        _open_streams += 1
+        metrics.REALTIME_STREAMS.set(_open_streams)
+        return True
+
+
+def _close_stream():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+        metrics.REALTIME_STREAMS.set(_open_streams)
+
+
+async def _infer(stream: RealtimeStream, final: bool) -> List[Dict]:
+    window, start, end = stream.next_window()
+    with metrics.timed("realtime_step"):
+        # Straight to the scheduler (no transcript cache): windows from all open streams share batches
+        future = await asyncio.to_thread(get_scheduler().submit, window)
+        # Shielded: a client leaving mid-step cancels this task, not the batch the window is in
+        preds = await asyncio.shield(asyncio.wrap_future(future))
+    return stream.update(preds, start, end, final)
+
+
+async def serve_stream(websocket):
+    """One realtime session: binary messages are 16 kHz mono int16 PCM; the text message
+    ``{"type": "end"}`` flushes the stream. Sends ``partial`` and ``final`` JSON hypotheses, then ``done``."""
+    await websocket.accept()
+    if not _open_stream():
+        await websocket.close(code=1013, reason="too many streams")
+        return
+
+    async def run_steps():
+        # Keeps going while audio piled up during the previous step, so a slow step doesn't stall the stream
+        while stream.ready():
+            for message in await _infer(stream, final=False):
+                await websocket.send_json(message)
+
+    steps = None
+    try:
+        model = await asyncio.to_thread(get_model)  # loads the pool on first use; keep it off the event loop
+        stream = RealtimeStream(get_frame_shift(model), get_blank_id(model),
+                                **{k: v for k, v in config.get("realtime", {}).items() if k != "max_streams"})
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes"):
+                stream.append(message["bytes"])
+            elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                if steps is not None:
+                    await steps
+                while stream.ready(final=True):
+                    for reply in await _infer(stream, final=True):
+                        await websocket.send_json(reply)
+                await websocket.send_json({"type": "done", "audio_seconds": stream.received / SAMPLE_RATE})
+                await websocket.close()
+                break
+
+            if steps is not None and steps.done():
+                steps.result()  # surface errors from the last step
+                steps = None
+            if steps is None and stream.ready():
+                steps = asyncio.create_task(run_steps())
+    except Exception as e:
+        logger.error(f"Realtime stream failed: {e}", exc_info=True)
+        metrics.record_failure("realtime")
+    finally:
+        if steps is not None and not steps.done():
+            steps.cancel()
+        _close_stream()
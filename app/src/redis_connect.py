@@ -1,10 +1,15 @@
 # worker.py
 
 import os
+import time
+import uuid
 import asyncio
 import aioredis
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from . import metrics
+from .config import config
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,49 +23,131 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")  # If your Redis requires authe
 # Construct Redis URL
 REDIS_URL = f"redis://{':' + REDIS_PASSWORD + '@' if REDIS_PASSWORD else ''}{REDIS_HOST}:{REDIS_PORT}"
 
+JOB_QUEUE = "job_queue"
+
+jobs_cfg = config.get("jobs", {})
+JOBS_PER_BATCH = jobs_cfg.get("jobs_per_batch", 8)
+RESULT_TTL = jobs_cfg.get("result_ttl_seconds", 24 * 3600)
+
 # Redis connection
 redis: aioredis.Redis = None
 
-async def connect_to_redis() -> None:
+async def connect_to_redis(client: Optional[aioredis.Redis] = None) -> None:
+    """Connect to REDIS_URL, or use ``client`` (e.g. a fakeredis.aioredis.FakeRedis in tests)."""
     global redis
     try:
-        redis = await aioredis.from_url(REDIS_URL)
+        redis = client if client is not None else await aioredis.from_url(REDIS_URL)
         await redis.ping()
         logger.info(f"Connected to Redis successfully at {REDIS_HOST}:{REDIS_PORT}")
     except aioredis.RedisError as e:
         logger.error(f"Failed to connect to Redis: {e}")
         raise
 
+async def get_redis() -> aioredis.Redis:
+    if redis is None:
+        await connect_to_redis()
+    return redis
+
+def _decode(job_data: Dict[bytes, bytes]) -> Dict[str, str]:
+    return {k.decode('utf-8'): v.decode('utf-8') for k, v in job_data.items()}
+
+async def create_job(audio_data: bytes, filename: str = "") -> str:
+    """Store the upload and queue it. Returns the job id."""
+    client = await get_redis()
+    job_id = uuid.uuid4().hex
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.set(f"job:{job_id}:audio", audio_data)
+        pipe.hset(f"job:{job_id}", mapping={
+            "status": "QUEUED",
+            "filename": filename or "",
+            "size": len(audio_data),
+            "created": time.time(),
+        })
+        pipe.lpush(JOB_QUEUE, job_id)
+        await pipe.execute()
+    return job_id
+
+async def get_job(job_id: str) -> Optional[Dict[str, str]]:
+    client = await get_redis()
+    job_data = await client.hgetall(f"job:{job_id}")
+    return _decode(job_data) if job_data else None
+
+async def get_jobs(job_ids: List[str]) -> Dict[str, Optional[Dict[str, str]]]:
+    """Fetch several jobs in one round trip."""
+    client = await get_redis()
+    async with client.pipeline(transaction=False) as pipe:
+        for job_id in job_ids:
+            pipe.hgetall(f"job:{job_id}")
+        results = await pipe.execute()
+    return {job_id: (_decode(data) if data else None) for job_id, data in zip(job_ids, results)}
+
 async def process_job(job_id: str, job_data: Dict[str, Any]) -> None:
+    # Imported here so the API process can queue jobs without loading the inference stack
+    from .inference import process_audio_chunked
+    from .pipeline import get_decode_stage
+
     # Update job status to PROCESSING
     await redis.hset(f"job:{job_id}", "status", "PROCESSING")
-    
-    # Here you would implement the actual transcription logic
-    # For this example, we'll just simulate work with a delay
     logger.info(f"Processing job {job_id}: {job_data}")
-    await asyncio.sleep(10)  # Simulate work
-    
-    # Update job status to COMPLETED
-    await redis.hset(f"job:{job_id}", "status", "COMPLETED")
-    logger.info(f"Completed job {job_id}")
+
+    try:
+        audio_data = await redis.get(f"job:{job_id}:audio")
+        if audio_data is None:
+            raise ValueError("audio for job is missing")
+
+        samples, duration = await get_decode_stage().decode(audio_data)
+        del audio_data
+
+        # Windows from every job in flight share the batch scheduler, so concurrent jobs fill GPU batches
+        start = time.time()
+        transcription = await asyncio.to_thread(process_audio_chunked, samples)
+        elapsed = time.time() - start
+        metrics.record_request("jobs", duration, elapsed)
+
+        await redis.hset(f"job:{job_id}", mapping={
+            "status": "COMPLETED",
+            "transcription": transcription,
+            "duration": duration,
+            "elapsed": elapsed,
+            "completed": time.time(),
+        })
+        logger.info(f"Completed job {job_id}")
+    except Exception as e:
+        logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+        metrics.record_failure("jobs")
+        await redis.hset(f"job:{job_id}", mapping={"status": "FAILED", "error": str(e)})
+    finally:
+        await redis.delete(f"job:{job_id}:audio")
+        await redis.expire(f"job:{job_id}", RESULT_TTL)
+
+async def next_jobs(max_jobs: int = JOBS_PER_BATCH) -> List[str]:
+    """Block for one job, then take up to ``max_jobs - 1`` more that are already queued."""
+    _, job_id = await redis.brpop(JOB_QUEUE)
+    job_ids = [job_id.decode('utf-8')]
+    while len(job_ids) < max_jobs:
+        job_id = await redis.rpop(JOB_QUEUE)
+        if job_id is None:
+            break
+        job_ids.append(job_id.decode('utf-8'))
+    return job_ids
 
 async def worker_loop() -> None:
     while True:
         try:
-            # Wait for a job in the queue
-            _, job_id = await redis.brpop("job_queue")
-            job_id = job_id.decode('utf-8')
-            
+            # Wait for jobs in the queue
+            job_ids = await next_jobs()
+
             # Get job data
-            job_data = await redis.hgetall(f"job:{job_id}")
-            job_data = {k.decode('utf-8'): v.decode('utf-8') for k, v in job_data.items()}
-            
-            # Process the job
-            await process_job(job_id, job_data)
+            jobs = await get_jobs(job_ids)
+
+            # Process the jobs together
+            await asyncio.gather(*(process_job(job_id, job_data or {}) for job_id, job_data in jobs.items()))
         except aioredis.RedisError as e:
             logger.error(f"Redis error: {e}")
             # Wait a bit before trying again
             await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error processing job: {e}")
 
@@ -0,0 +1,49 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def make_windows(num_samples: int, window_size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Split ``num_samples`` into (start, end) windows of ``window_size`` that overlap by ``overlap``."""
+    if window_size <= overlap:
+        raise ValueError(f"Window ({window_size} samples) must be longer than its overlap ({overlap} samples)")
+    if num_samples <= window_size:
+        return [(0, num_samples)]
+
+    stride = window_size - overlap
+    windows = []
+    start = 0
+    while True:
+        end = min(start + window_size, num_samples)
+        windows.append((start, end))
+        if end == num_samples:
+            break
+        start += stride
+    return windows
+
+
+def stitch_frames(frame_preds: List[np.ndarray], windows: List[Tuple[int, int]], frame_shift: int) -> np.ndarray:
+    """Merge per-window frame predictions into one frame sequence on the original timeline.
+
+    Each seam is cut in the middle of its overlap, so every frame kept comes from the window
+    where it has the most context on both sides. Returns the per-frame predictions, one frame
+    every ``frame_shift`` samples from the start of the audio.
+    """
+    if len(frame_preds) == 1:
+        return frame_preds[0]
+
+    pieces = []
+    for i, (preds, (start, end)) in enumerate(zip(frame_preds, windows)):
+        # Sample range this window is responsible for
+        keep_start = start if i == 0 else (start + windows[i - 1][1]) // 2
+        keep_end = end if i == len(windows) - 1 else (end + windows[i + 1][0]) // 2
+
+        # Convert to frame indices local to this window; frame j covers start + j * frame_shift
+        first = max(0, (keep_start - start + frame_shift // 2) // frame_shift)
+        last = min(len(preds), (keep_end - start + frame_shift // 2) // frame_shift)
+        if i == len(windows) - 1:
+            last = len(preds)  # keep the trailing partial frame, as a single window does
+        pieces.append(preds[first:last])
+
+    return np.concatenate(pieces)
+
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from typing import AsyncIterator
+
+import numpy as np
+
+from . import metrics
+from .config import config
+from .inference import frames_to_text, get_window_seconds, submit_window
+from .model import get_model, get_frame_shift
+from .stitching import stitch_frames
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2  # ffmpeg emits s16le
+STDERR_TAIL_BYTES = 4096  # kept for the error message
+
+
+async def _feed(proc, chunks: AsyncIterator[bytes]):
+    """Copy upload chunks into ffmpeg's stdin as they arrive."""
+    try:
+        async for chunk in chunks:
+            if chunk:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+    finally:
+        proc.stdin.close()
+
+
+async def _drain(stream, tail: bytearray):
+    """Read ffmpeg's stderr as it is written, keeping only the last STDERR_TAIL_BYTES.
+
+    Left unread, a noisy decode fills the pipe and blocks ffmpeg mid-stream.
+    """
+    while True:
+        data = await stream.read(4096)
+        if not data:
+            break
+        tail += data
+        del tail[:-STDERR_TAIL_BYTES]
+
+
+async def transcribe_stream(chunks: AsyncIterator[bytes]):
+    """Decode an upload incrementally and queue overlapping windows for inference as they fill.
+
+    Returns (transcription, duration in seconds). At most ``max_pending_windows`` windows are
+    decoded ahead of inference; past that, reading from ffmpeg (and so from the client) pauses.
+    """
+    chunking_cfg = config.get("chunking", {})
+    stream_cfg = config.get("streaming", {})
+    window_size = int(get_window_seconds() * SAMPLE_RATE)
+    overlap = int(chunking_cfg.get("overlap_seconds", 4) * SAMPLE_RATE)
+    read_size = stream_cfg.get("read_size", 1 << 16)
+    max_pending = stream_cfg.get("max_pending_windows", 8)
+
+    stride = window_size - overlap
+
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    feeder = asyncio.create_task(_feed(proc, chunks))
+    stderr_tail = bytearray()
+    stderr_reader = asyncio.create_task(_drain(proc.stderr, stderr_tail))
+
+    buffer = bytearray()
+    buffer_start = 0  # sample offset of buffer[0] in the whole recording
+    windows = []
+    pending = []
+    results = []
+    total_bytes = 0
+
+    async def submit(num_samples: int, drop: int):
+        nonlocal buffer_start
+        # astype copies out of the bytearray, so the front of the buffer can be dropped right after
+        samples = np.frombuffer(buffer, dtype=np.int16, count=num_samples).astype(np.float32)
+        samples *= 1.0 / 32768.0
+        windows.append((buffer_start, buffer_start + num_samples))
+        # Keep the overlap for the next window
+        del buffer[:drop * BYTES_PER_SAMPLE]
+        buffer_start += drop
+        # submit blocks when the scheduler queue is full (and hashes the window), so keep it off the event loop
+        future = await asyncio.to_thread(submit_window, samples)
+        pending.append(asyncio.wrap_future(future))
+
+    try:
+        while True:
+            data = await proc.stdout.read(read_size)
+            if not data:
+                break
+            buffer += data
+            total_bytes += len(data)
+
+            while len(buffer) >= window_size * BYTES_PER_SAMPLE:
+                await submit(window_size, stride)
+                logger.info(f"Queued window {len(windows)} at {windows[-1][0] / SAMPLE_RATE:.1f}s")
+
+                # Backpressure: wait for the oldest window before decoding further
+                while len(pending) >= max_pending:
+                    results.append(await pending.pop(0))
+
+        # Surface client-side errors (e.g. disconnect) before ffmpeg's
+        await feeder
+        returncode = await proc.wait()
+        await stderr_reader
+        if returncode != 0:
+            stderr = stderr_tail.decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg exited with {returncode}: {stderr}")
+
+        # The tail is only new audio if it extends past the previous window's overlap
+        remaining = len(buffer) // BYTES_PER_SAMPLE
+        if remaining > (overlap if windows else 0):
+            await submit(remaining, remaining)
+
+        for future in pending:
+            results.append(await future)
+    finally:
+        if not feeder.done():
+            feeder.cancel()
+        if not stderr_reader.done():
+            stderr_reader.cancel()
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+    duration = total_bytes / (SAMPLE_RATE * BYTES_PER_SAMPLE)
+    if not results:
+        return "", duration
+
+    with metrics.timed("stitch"):
+        frames = stitch_frames(results, windows, get_frame_shift(get_model()))
+        return frames_to_text(frames), duration
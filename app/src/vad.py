@@ -0,0 +1,75 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def frame_energy_db(samples: np.ndarray, frame_size: int) -> np.ndarray:
+    """RMS level of each non-overlapping frame in dBFS (the last partial frame is zero-padded)."""
+    num_frames = -(-len(samples) // frame_size)
+    frames = np.zeros(num_frames * frame_size, dtype=np.float32)
+    frames[:len(samples)] = samples
+    power = np.mean(frames.reshape(num_frames, frame_size) ** 2, axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(start, end) frame indices of each run of True in ``mask``."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]
+
+
+def _split_at_pauses(start: int, end: int, energy_db: np.ndarray, max_frames: int) -> List[Tuple[int, int]]:
+    """Cut a run longer than ``max_frames`` at its quietest frame in the back half of each piece."""
+    pieces = []
+    first = max(1, max_frames // 2)  # every cut advances, even when a piece is a single frame
+    while end - start > max_frames:
+        search = energy_db[start + first:start + max(max_frames, first + 1)]
+        cut = start + first + int(np.argmin(search))
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def speech_segments(samples: np.ndarray, sample_rate: int, max_segment_samples: int, frame_ms: float = 30,
+                    threshold_db: float = -50.0, margin_db: float = 12.0, min_speech_ms: float = 250,
+                    min_silence_ms: float = 400, pad_ms: float = 200) -> List[Tuple[int, int]]:
+    """Energy-based voice activity detection: (start, end) sample ranges that contain speech.
+
+    A frame is speech when it is ``margin_db`` above the noise floor (10th percentile level),
+    never below ``threshold_db``, and never more than 25 dB under the loud (95th percentile)
+    frames so all-speech audio is not trimmed. Pauses shorter than ``min_silence_ms`` are kept,
+    bursts shorter than ``min_speech_ms`` dropped, and each segment padded by ``pad_ms``.
+    Segments longer than ``max_segment_samples`` are cut at the quietest point near the limit,
+    so every segment fits one model window and no cut lands mid-word if a pause is available.
+    """
+    if len(samples) == 0:
+        return []
+
+    frame_size = int(sample_rate * frame_ms / 1000)
+    energy_db = frame_energy_db(samples, frame_size)
+    noise_floor, loud = np.percentile(energy_db, [10, 95])
+    threshold = max(threshold_db, min(noise_floor + margin_db, loud - 25.0))
+    starts, ends = _runs(energy_db > threshold)
+    if len(starts) == 0:
+        return []
+
+    # Bridge short pauses, then drop what is still too short to be speech
+    bridged = (starts[1:] - ends[:-1]) < min_silence_ms / frame_ms
+    starts = starts[np.concatenate(([True], ~bridged))]
+    ends = ends[np.concatenate((~bridged, [True]))]
+    long_enough = (ends - starts) >= min_speech_ms / frame_ms
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    pad = int(pad_ms / frame_ms)
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, len(energy_db))
+
+    max_frames = max(1, max_segment_samples // frame_size)
+    segments = []
+    for start, end in zip(starts, ends):
+        if segments and start <= segments[-1][1]:  # padding made them touch
+            start = segments.pop()[0]
+        segments.extend(_split_at_pauses(int(start), int(end), energy_db, max_frames))
+
+    return [(start * frame_size, min(end * frame_size, len(samples))) for start, end in segments]
@@ -0,0 +1,76 @@
+import time
+import logging
+import threading
+
+import numpy as np
+
+from .batching import batch_limit, forward_batch, get_scheduler
+from .config import config
+from .inference import get_window_seconds
+from .model import get_model_pool
+from .profiling import get_bucket_profiles
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {"ready": False, "error": None, "load_seconds": None, "warmup_seconds": None, "cold_start_seconds": None}
+
+
+def warmup():
+    """Load every replica and run forward passes at the configured batch shapes, then one
+    full batch per duration-bucket profile (see src/profiling.py).
+
+    The first real request then finds weights resident, cuDNN autotuning done and the
+    caching allocator already sized for a full batch.
+    """
+    start = time.time()
+    try:
+        warmup_cfg = config.get("warmup") or {}
+        # Either a single value or a list in config.yml
+        window_seconds = np.atleast_1d(warmup_cfg.get("window_seconds") or get_window_seconds()).tolist()
+        batch_sizes = np.atleast_1d(warmup_cfg.get("batch_sizes")
+                                    or [1, config.get("batching", {}).get("max_batch_size", 8)]).astype(int).tolist()
+        if not all(s > 0 for s in window_seconds) or not all(b > 0 for b in batch_sizes):
+            raise ValueError(f"warmup.window_seconds and warmup.batch_sizes must be positive, "
+                             f"got {window_seconds} and {batch_sizes}")
+        overlap_seconds = config.get("chunking", {}).get("overlap_seconds", 4)
+        if get_window_seconds() <= overlap_seconds:
+            raise ValueError(f"chunking.window_seconds ({get_window_seconds()}s) must be longer than "
+                             f"chunking.overlap_seconds ({overlap_seconds}s)")
+
+        pool = get_model_pool()
+        loaded = time.time()
+
+        sample_rate = config["model"]["sample_rate"]
+        max_batch_size = get_scheduler().max_batch_size
+        for device, replica in pool:
+            for seconds in window_seconds:
+                window = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+                for batch_size in batch_sizes:
+                    forward_batch(replica, [window] * batch_size)
+            for profile in get_bucket_profiles():
+                window = np.zeros(int(get_window_seconds(profile) * sample_rate), dtype=np.float32)
+                forward_batch(replica, [window] * batch_limit(profile, max_batch_size), profile)
+            logger.info(f"Warmed up {device}: windows {window_seconds}s x batch sizes {batch_sizes}, "
+                        f"{len(get_bucket_profiles())} bucket profile(s)")
+        done = time.time()
+
+        with _lock:
+            _state.update(ready=True, load_seconds=loaded - start, warmup_seconds=done - loaded,
+                          cold_start_seconds=done - start)
+        logger.info(f"Cold start: load {loaded - start:.2f}s, warmup {done - loaded:.2f}s, total {done - start:.2f}s")
+    except Exception as e:
+        with _lock:
+            _state["error"] = str(e)
+        logger.error(f"Warmup failed: {str(e)}", exc_info=True)
+
+
+def skip_warmup():
+    """Report ready without warming up (``warmup.enabled: false``); replicas load on first use."""
+    with _lock:
+        _state["ready"] = True
+
+
+def readiness():
+    with _lock:
+        return dict(_state)
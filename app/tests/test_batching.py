@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from src.batching import BatchScheduler
+
+
+def blocking_scheduler():
+    """A scheduler whose batches wait for ``release``; ``started`` is set once a batch is running."""
+    started, release = threading.Event(), threading.Event()
+
+    def run_batch(items, profile):
+        started.set()
+        release.wait(5)
+        return [item * 2 for item in items]
+
+    return BatchScheduler(run_batch, max_batch_size=4, max_wait_ms=1), started, release
+
+
+def test_cancelled_future_is_dropped_and_scheduler_keeps_running():
+    scheduler, started, release = blocking_scheduler()
+    running = scheduler.submit(1)
+    assert started.wait(5)
+
+    queued = scheduler.submit(2)
+    assert queued.cancel()
+    release.set()
+
+    assert running.result(timeout=5) == 2
+    assert scheduler.submit(3).result(timeout=5) == 6
+    assert scheduler._thread.is_alive()
+
+
+def test_running_future_cannot_be_cancelled():
+    scheduler, started, release = blocking_scheduler()
+    running = scheduler.submit(1)
+    assert started.wait(5)
+
+    assert not running.cancel()
+    release.set()
+    assert running.result(timeout=5) == 2
+
+
+def test_failed_batch_fails_its_futures_only():
+    calls = []
+
+    def run_batch(items, profile):
+        calls.append(items)
+        if len(calls) == 1:
+            raise RuntimeError("out of memory")
+        return items
+
+    scheduler = BatchScheduler(run_batch, max_batch_size=1, max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        scheduler.submit("a").result(timeout=5)
+    assert scheduler.submit("b").result(timeout=5) == "b"
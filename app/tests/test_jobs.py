@@ -0,0 +1,109 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aioredis")
+fakeredis = pytest.importorskip("fakeredis")
+
+from src import inference, pipeline, redis_connect
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    fake = fakeredis.aioredis.FakeRedis()
+    await redis_connect.connect_to_redis(fake)
+    yield fake
+    await fake.flushall()
+    redis_connect.redis = None
+
+
+class FakeDecodeStage:
+    def __init__(self, error: Exception = None):
+        self.error = error
+
+    async def decode(self, data):
+        if self.error is not None:
+            raise self.error
+        return np.zeros(16000, dtype=np.float32), 1.0
+
+
+async def wait_for_status(job_id, statuses, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        job = await redis_connect.get_job(job_id)
+        if job["status"] in statuses or asyncio.get_running_loop().time() > deadline:
+            return job
+        await asyncio.sleep(0.01)
+
+
+async def run_worker_until(job_id, statuses):
+    worker = asyncio.create_task(redis_connect.worker_loop())
+    try:
+        return await wait_for_status(job_id, statuses)
+    finally:
+        worker.cancel()
+
+
+async def test_create_job_queues_it(client):
+    job_id = await redis_connect.create_job(b"audio bytes", "a.wav")
+
+    job = await redis_connect.get_job(job_id)
+    assert job["status"] == "QUEUED"
+    assert job["filename"] == "a.wav"
+    assert job["size"] == str(len(b"audio bytes"))
+    assert await client.get(f"job:{job_id}:audio") == b"audio bytes"
+    assert await client.lrange(redis_connect.JOB_QUEUE, 0, -1) == [job_id.encode()]
+
+
+async def test_get_job_unknown_id(client):
+    assert await redis_connect.get_job("missing") is None
+
+
+async def test_get_jobs_maps_unknown_ids_to_none(client):
+    first = await redis_connect.create_job(b"1")
+    second = await redis_connect.create_job(b"2")
+
+    jobs = await redis_connect.get_jobs([first, "missing", second])
+    assert list(jobs) == [first, "missing", second]
+    assert jobs[first]["status"] == jobs[second]["status"] == "QUEUED"
+    assert jobs["missing"] is None
+
+
+async def test_worker_completes_job(client, monkeypatch):
+    monkeypatch.setattr(pipeline, "get_decode_stage", lambda: FakeDecodeStage())
+    monkeypatch.setattr(inference, "process_audio_chunked", lambda samples: "hello world")
+    job_id = await redis_connect.create_job(b"audio", "a.wav")
+
+    job = await run_worker_until(job_id, {"COMPLETED", "FAILED"})
+    assert job["status"] == "COMPLETED"
+    assert job["transcription"] == "hello world"
+    assert float(job["duration"]) == 1.0
+    assert await client.exists(f"job:{job_id}:audio") == 0
+    assert await client.ttl(f"job:{job_id}") > 0
+
+
+async def test_worker_marks_failed_job(client, monkeypatch):
+    monkeypatch.setattr(pipeline, "get_decode_stage", lambda: FakeDecodeStage(ValueError("not audio")))
+    job_id = await redis_connect.create_job(b"garbage", "a.txt")
+
+    job = await run_worker_until(job_id, {"COMPLETED", "FAILED"})
+    assert job["status"] == "FAILED"
+    assert job["error"] == "not audio"
+    assert await client.exists(f"job:{job_id}:audio") == 0
+
+
+async def test_worker_takes_queued_jobs_together(client, monkeypatch):
+    monkeypatch.setattr(pipeline, "get_decode_stage", lambda: FakeDecodeStage())
+    monkeypatch.setattr(inference, "process_audio_chunked", lambda samples: "ok")
+    job_ids = [await redis_connect.create_job(b"audio") for _ in range(3)]
+
+    assert await redis_connect.next_jobs(max_jobs=8) == job_ids
+    assert await client.llen(redis_connect.JOB_QUEUE) == 0
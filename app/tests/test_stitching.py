@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from src.stitching import make_windows, stitch_frames
+
+FRAME_SHIFT = 4
+
+
+def window_preds(num_samples, windows):
+    """What a model would predict per window if frame j of the audio were labelled j."""
+    frames = np.arange(-(-num_samples // FRAME_SHIFT))
+    return frames, [frames[start // FRAME_SHIFT:start // FRAME_SHIFT - (-(end - start) // FRAME_SHIFT)]
+                    for start, end in windows]
+
+
+def test_short_input_is_one_window():
+    assert make_windows(10, 40, 8) == [(0, 10)]
+    assert make_windows(0, 40, 8) == [(0, 0)]
+
+
+def test_exact_fit_is_one_window():
+    assert make_windows(40, 40, 8) == [(0, 40)]
+
+
+def test_windows_overlap_and_end_at_the_input():
+    assert make_windows(100, 40, 8) == [(0, 40), (32, 72), (64, 100)]
+    # The last full stride lands exactly on the end: no empty or one-sample trailing window
+    assert make_windows(104, 40, 8) == [(0, 40), (32, 72), (64, 104)]
+    assert make_windows(41, 40, 8) == [(0, 40), (32, 41)]
+
+
+@pytest.mark.parametrize("overlap", [40, 48])
+def test_overlap_not_shorter_than_window_is_rejected(overlap):
+    with pytest.raises(ValueError):
+        make_windows(100, 40, overlap)
+
+
+@pytest.mark.parametrize("num_samples, window_size, overlap", [
+    (10, 40, 8), (40, 40, 8), (41, 40, 8), (100, 40, 8), (104, 40, 8), (73, 20, 4), (1000, 64, 16),
+])
+def test_stitching_restores_the_timeline(num_samples, window_size, overlap):
+    windows = make_windows(num_samples, window_size, overlap)
+    frames, preds = window_preds(num_samples, windows)
+    np.testing.assert_array_equal(stitch_frames(preds, windows, FRAME_SHIFT), frames)
+
+
+def test_seam_is_cut_mid_overlap():
+    windows = make_windows(72, 40, 8)  # overlap covers samples 32-40, frames 8-9
+    preds = [np.zeros(10, dtype=np.int64), np.ones(10, dtype=np.int64)]
+    stitched = stitch_frames(preds, windows, FRAME_SHIFT)
+    np.testing.assert_array_equal(stitched, [0] * 9 + [1] * 9)
@@ -0,0 +1,85 @@
+import sys
+import json
+import time
+import argparse
+import jiwer
+import soundfile as sf
+import torch
+from src.config import config
+from src.backends import create_backend
+from src.AudioProcessor import LengthBucketBatchSampler
+from src.audio_cache import open_audio_cache
+from src.evaluation import build_index, sample_entries
+
+def evaluate(backend, audios, durations, refs, max_batch_seconds):
+    hypotheses = [None] * len(audios)
+    start = time.time()
+    with torch.no_grad():
+        for batch in LengthBucketBatchSampler(durations, max_batch_seconds=max_batch_seconds):
+            texts = backend.transcribe([audios[i] for i in batch], batch_size=len(batch))
+            for i, text in zip(batch, texts):
+                hypotheses[i] = text
+    elapsed = time.time() - start
+    return jiwer.wer(refs, hypotheses), elapsed / sum(durations)
+
+def default_device(precision):
+    if precision == 'int8-dynamic' or not (config.get('use_cuda', False) and torch.cuda.is_available()):
+        return 'cpu'
+    return 'cuda'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reject precision modes whose WER regresses past a threshold')
+    parser.add_argument('--dataset_path', type=str, default='LibriSpeech/test-clean')
+    parser.add_argument('--num_files', type=int, default=200, help='Size of the LibriSpeech subset')
+    parser.add_argument('--precisions', type=str, nargs='+', default=[config.get('precision', 'fp32')],
+                        help='Candidates to check against fp32 (default: precision in config.yml)')
+    parser.add_argument('--max_wer_increase', type=float, default=0.005,
+                        help='Largest allowed absolute WER increase over fp32 (default: 0.005)')
+    parser.add_argument('--max_batch_seconds', type=float, default=600.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--audio_cache', type=str, default=None, help='Pre-decoded audio from tools/build_audio_cache.py')
+    parser.add_argument('--output', type=str, default='accuracy_gate.json')
+    args = parser.parse_args()
+
+    entries = sample_entries(build_index(args.dataset_path), args.num_files, args.seed)
+    refs, durations = [e['reference'] for e in entries], [e['duration'] for e in entries]
+    cache = open_audio_cache(args.audio_cache)
+    audios = [cache.load(e['path']) if cache else sf.read(e['path'], dtype='float32')[0] for e in entries]
+    print(f"Subset: {len(entries)} files, {sum(durations):.1f}s of audio")
+
+    results = {}
+    # The baseline runs on the same device as each candidate, so int8 on CPU is compared to fp32 on CPU
+    for precision in args.precisions:
+        device = default_device(precision)
+        baseline_key = f'fp32@{device}'
+        if baseline_key not in results:
+            backend = create_backend(device, 'fp32')
+            wer, rtf = evaluate(backend, audios, durations, refs, args.max_batch_seconds)
+            results[baseline_key] = {'precision': 'fp32', 'device': device, 'wer': wer, 'rtf': rtf}
+            del backend
+
+        backend = create_backend(device, precision)
+        wer, rtf = evaluate(backend, audios, durations, refs, args.max_batch_seconds)
+        del backend
+        baseline = results[baseline_key]
+        increase = wer - baseline['wer']
+        results[f'{precision}@{device}'] = {
+            'precision': precision,
+            'device': device,
+            'wer': wer,
+            'rtf': rtf,
+            'wer_increase': increase,
+            'speedup': baseline['rtf'] / rtf if rtf > 0 else None,
+            'accepted': increase <= args.max_wer_increase,
+        }
+
+    print("\nAccuracy Gate:")
+    for key, result in results.items():
+        verdict = '' if 'accepted' not in result else ('ACCEPTED' if result['accepted'] else 'REJECTED')
+        print(f"{key}: WER {result['wer']:.4f}, RTF {result['rtf']:.4f} {verdict}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'max_wer_increase': args.max_wer_increase, 'num_files': len(entries), 'results': results}, f, indent=2)
+
+    if not all(r.get('accepted', True) for r in results.values()):
+        sys.exit(1)
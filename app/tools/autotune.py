@@ -0,0 +1,29 @@
+import json
+import argparse
+from src.config import config
+from src.profiling import BUCKET_RTF_TOLERANCE, SETTING_KEYS, bucket_profiles, load_results, save_results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Pick one inference profile per input-duration bucket from a profile_sweep table')
+    parser.add_argument('--results', type=str, default=config.get('profiling', {}).get('results_path', 'profiles/sweep.json'),
+                        help='Table written by tools/profile_sweep.py; its --durations are the bucket edges')
+    parser.add_argument('--rtf_tolerance', type=float, default=BUCKET_RTF_TOLERANCE,
+                        help='Keep the default setting in a bucket unless another is this much faster (relative RTF)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Default: update --results in place (the server reloads profiling.results_path)')
+    args = parser.parse_args()
+
+    table = load_results(args.results)
+    rows = table['rows']
+    max_peak_mb = config.get('memory', {}).get('vram_ceiling_mb') if table['device_type'] == 'cuda' else None
+    precisions = sorted({r['precision'] for r in rows})
+    table['buckets'] = {precision: bucket_profiles(rows, precision, max_peak_mb, args.rtf_tolerance) for precision in precisions}
+    output = args.output or args.results
+    save_results(output, table)
+
+    for precision, profiles in table['buckets'].items():
+        print(f"\n{precision}:")
+        for profile in profiles:
+            print(f"  <= {profile['max_duration']:g}s: " + json.dumps({k: profile[k] for k in SETTING_KEYS[:-1]})
+                  + f" RTF {profile['rtf']:.4f}, peak {profile['peak_mb']:.0f} MB")
+    print(f"Results saved to {output}")
@@ -0,0 +1,77 @@
+import json
+import time
+import resource
+import argparse
+import multiprocessing as mp
+import soundfile as sf
+import torch
+from src.AudioProcessor import LengthBucketBatchSampler, read_durations
+from src.audio_cache import open_audio_cache
+from src.evaluation import build_index, sample_entries
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_backend(name, device, audio_files, max_batch_seconds, threads, audio_cache, queue):
+    """One backend per process, so peak RSS is that backend's alone."""
+    from src.backends import create_backend
+    torch.set_num_threads(threads)
+
+    baseline_rss = peak_rss_mb()
+    start = time.time()
+    backend = create_backend(device, 'fp32', name=name)
+    load_seconds = time.time() - start
+    loaded_rss = peak_rss_mb()
+
+    cache = open_audio_cache(audio_cache)
+    durations = read_durations(audio_files, cache)
+    audios = [cache.load(f) if cache else sf.read(f, dtype='float32')[0] for f in audio_files]
+    backend.transcribe(audios[:1])  # warm up allocators and the onnxruntime graph
+
+    start = time.time()
+    with torch.no_grad():
+        for batch in LengthBucketBatchSampler(durations, max_batch_seconds=max_batch_seconds):
+            backend.transcribe([audios[i] for i in batch], batch_size=len(batch))
+    elapsed = time.time() - start
+
+    queue.put({
+        'backend': name,
+        'device': device,
+        'load_seconds': load_seconds,
+        'rtf': elapsed / sum(durations),
+        'model_rss_mb': loaded_rss - baseline_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'cuda_peak_mb': torch.cuda.max_memory_allocated() / 2**20 if device.startswith('cuda') else None,
+    })
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare RTF and memory of model backends on the same audio')
+    parser.add_argument('--dataset_path', type=str, default='LibriSpeech/test-clean')
+    parser.add_argument('--num_files', type=int, default=100)
+    parser.add_argument('--backends', type=str, nargs='+', default=['nemo', 'onnx'])
+    parser.add_argument('--device', type=str, default='cpu')
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--max_batch_seconds', type=float, default=300.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--audio_cache', type=str, default=None, help='Pre-decoded audio from tools/build_audio_cache.py')
+    parser.add_argument('--output', type=str, default='bench_backends.json')
+    args = parser.parse_args()
+
+    audio_files = [e['path'] for e in sample_entries(build_index(args.dataset_path), args.num_files, args.seed)]
+    ctx = mp.get_context('spawn')
+    results = []
+    for name in args.backends:
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_backend,
+                              args=(name, args.device, audio_files, args.max_batch_seconds, args.threads,
+                                    args.audio_cache, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"\n{'backend':<12}{'RTF':>10}{'load s':>10}{'model MB':>12}{'peak MB':>12}")
+    for r in results:
+        print(f"{r['backend']:<12}{r['rtf']:>10.4f}{r['load_seconds']:>10.1f}{r['model_rss_mb']:>12.0f}{r['peak_rss_mb']:>12.0f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'args': vars(args), 'results': results}, f, indent=2)
@@ -0,0 +1,71 @@
+import time
+import argparse
+import numpy as np
+import torch
+from src.decoding import greedy_decode
+
+def fake_log_probs(batch_size, num_frames, vocab_size, blank_id, seed=0):
+    """Peaky CTC-like outputs: mostly blank, with short runs of tokens, and ragged lengths."""
+    generator = torch.Generator().manual_seed(seed)
+    logits = torch.randn(batch_size, num_frames, vocab_size, generator=generator)
+    logits[..., blank_id] += 4.0
+    lengths = torch.randint(num_frames // 2, num_frames + 1, (batch_size,), generator=generator)
+    return logits.log_softmax(dim=-1), lengths
+
+def collapse_frames(frames, blank_id):
+    """Greedy CTC collapse of one utterance: merge repeats and drop blanks."""
+    is_new = np.ones(len(frames), dtype=bool)
+    is_new[1:] = frames[1:] != frames[:-1]
+    return frames[is_new & (frames != blank_id)]
+
+def per_utterance(log_probs, lengths, blank_id):
+    """Baseline: argmax on the device, then one numpy collapse per utterance on the host."""
+    predictions = log_probs.argmax(dim=-1)
+    return [collapse_frames(predictions[i, :lengths[i]].numpy(), blank_id) for i in range(len(lengths))]
+
+def nemo_decoder(blank_id):
+    from nemo.collections.asr.parts.submodules.ctc_greedy_decoding import GreedyBatchedCTCInfer
+    decoder = GreedyBatchedCTCInfer(blank_id=blank_id)
+    return lambda log_probs, lengths: [h.y_sequence for h in decoder(decoder_output=log_probs, decoder_lengths=lengths)[0]]
+
+def bench(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return (time.perf_counter() - start) / iterations, result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare greedy CTC decoders on large batches of logits')
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[8, 32, 128])
+    parser.add_argument('--window_seconds', type=float, default=40, help='Frames per item at 80 ms per frame')
+    parser.add_argument('--vocab_size', type=int, default=1025, help='parakeet-ctc: 1024 tokens + blank')
+    parser.add_argument('--device', type=str, default='cpu')
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    blank_id = args.vocab_size - 1
+    num_frames = int(args.window_seconds / 0.08)
+    decoders = {
+        'batched (src/decoding.py)': lambda lp, ln: [t for t, _, _ in greedy_decode(lp, ln, blank_id)],
+        'per-utterance collapse': lambda lp, ln: per_utterance(lp.cpu(), ln.cpu(), blank_id),
+    }
+    try:
+        decoders['nemo GreedyBatchedCTCInfer'] = nemo_decoder(blank_id)
+    except ImportError:
+        print("NeMo not installed; skipping its decoder")
+
+    for batch_size in args.batch_sizes:
+        log_probs, lengths = fake_log_probs(batch_size, num_frames, args.vocab_size, blank_id)
+        log_probs, lengths = log_probs.to(args.device), lengths.to(args.device)
+        print(f"\nbatch {batch_size} x {num_frames} frames x {args.vocab_size} classes")
+        # The argmax over the vocabulary is common to all of them and usually dominates
+        seconds, _ = bench(lambda: log_probs.argmax(dim=-1), args.iterations)
+        print(f"  {'argmax alone':<28}{seconds * 1000:>9.2f} ms")
+        reference = None
+        for name, decode in decoders.items():
+            seconds, tokens = bench(lambda: decode(log_probs, lengths), args.iterations)
+            tokens = [list(map(int, t)) for t in tokens]
+            agrees = reference is None or tokens == reference
+            reference = reference or tokens
+            print(f"  {name:<28}{seconds * 1000:>9.2f} ms  {'' if agrees else 'MISMATCH'}")
@@ -0,0 +1,46 @@
+import time
+import argparse
+from src import metrics
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+def noop():
+    pass
+
+def observe():
+    metrics.observe_stage("bench", 0.01)
+
+def timed():
+    with metrics.timed("bench"):
+        pass
+
+def request():
+    metrics.record_request("bench", 12.5, 0.2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure per-call overhead of the metrics hot path')
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    baseline = bench(noop, args.iterations)
+    results = {
+        'observe_stage': bench(observe, args.iterations) - baseline,
+        'timed (context manager)': bench(timed, args.iterations) - baseline,
+        'record_request': bench(request, args.iterations) - baseline,
+    }
+
+    # A /transcribe request touches roughly: 5 stage timers, 1 request record, and per window
+    # one queue observation; per batch one inference, one batch-size and one gauge update
+    per_request = 5 * results['timed (context manager)'] + results['record_request']
+    per_window = results['observe_stage']
+
+    print("\nMetrics Overhead:")
+    for name, seconds in results.items():
+        print(f'{name}: {seconds * 1e6:.2f} us/call')
+    print(f'Per request (excluding windows): {per_request * 1e6:.2f} us')
+    print(f'Per window: {per_window * 1e6:.2f} us')
+    print(f'Share of a 10 s clip at RTF 0.0168 (168 ms): {(per_request + per_window) / 0.168 * 100:.4f}%')
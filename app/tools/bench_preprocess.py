@@ -0,0 +1,62 @@
+import io
+import time
+import argparse
+import numpy as np
+import soundfile as sf
+from src.preprocess import convert_audio
+
+# (name, soundfile format, subtype, sample rate, channels): what clients actually send us
+FORMATS = [
+    ('wav 44.1k stereo', 'WAV', 'PCM_16', 44100, 2),
+    ('wav 48k stereo', 'WAV', 'PCM_16', 48000, 2),
+    ('flac 44.1k stereo', 'FLAC', 'PCM_16', 44100, 2),
+    ('ogg 48k stereo', 'OGG', 'VORBIS', 48000, 2),
+    ('mp3 44.1k stereo', 'MP3', 'MPEG_LAYER_III', 44100, 2),
+    ('wav 16k mono', 'WAV', 'PCM_16', 16000, 1),
+]
+
+def make_upload(seconds, fmt, subtype, rate, channels, seed=0):
+    """Speech-band noise bursts, encoded in memory."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    mono = 0.1 * rng.standard_normal(len(t)) * (0.6 + 0.4 * np.sin(2 * np.pi * 2 * t))
+    audio = np.stack([mono] * channels, axis=1).astype(np.float32)
+    buf = io.BytesIO()
+    with sf.SoundFile(buf, 'w', rate, channels, format=fmt, subtype=subtype) as f:
+        # libsndfile's Vorbis encoder crashes on very large single writes
+        for i in range(0, len(audio), rate):
+            f.write(audio[i:i + rate])
+    return buf.getvalue()
+
+def pydub_convert(audio_bytes):
+    """The conversion this replaced: AudioSegment decode, then set_channels / set_sample_width / set_frame_rate."""
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
+    audio = audio.set_channels(1).set_sample_width(2).set_frame_rate(16000)
+    return np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.float32) / 32768.0
+
+def bench(fn, data, iterations):
+    fn(data)  # first call builds the resampling kernel
+    start = time.perf_counter()
+    for _ in range(iterations):
+        samples = fn(data)
+    return (time.perf_counter() - start) / iterations, samples
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time upload conversion to 16 kHz mono float32 per input format')
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'format':<20}{'path':>10}{'new ms':>10}{'pydub ms':>10}{'speedup':>9}")
+    for name, fmt, subtype, rate, channels in FORMATS:
+        data = make_upload(args.seconds, fmt, subtype, rate, channels)
+        new_seconds, samples = bench(lambda d: convert_audio(d)[0], data, args.iterations)
+        path = convert_audio(data)[2][0]
+        try:
+            old_seconds, _ = bench(pydub_convert, data, args.iterations)
+            old, speedup = f"{old_seconds * 1000:.1f}", f"{old_seconds / new_seconds:.1f}x"
+        except Exception:  # pydub needs ffmpeg for anything but WAV
+            old, speedup = "n/a", ""
+        assert abs(len(samples) - args.seconds * 16000) <= 16000 * 0.1, f"{name}: {len(samples)} samples"
+        print(f"{name:<20}{path:>10}{new_seconds * 1000:>10.1f}{old:>10}{speedup:>9}")
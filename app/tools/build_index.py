@@ -0,0 +1,12 @@
+import argparse
+from src.evaluation import build_index, default_index_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write the utterance index (paths, durations, references) for a LibriSpeech split')
+    parser.add_argument('--dataset_path', type=str, default='LibriSpeech/test-clean')
+    parser.add_argument('--index', type=str, default=None, help='Default: <dataset_path>.index.jsonl')
+    args = parser.parse_args()
+
+    entries = build_index(args.dataset_path, args.index, rebuild=True)
+    print(f"Indexed {len(entries)} utterances ({sum(e['duration'] for e in entries):.1f}s of audio) "
+          f"to {args.index or default_index_path(args.dataset_path)}")
@@ -0,0 +1,90 @@
+import os
+import json
+import argparse
+import numpy as np
+import torch
+from src.config import config
+from src.model import load_model
+
+class EncoderDecoder(torch.nn.Module):
+    """Features -> CTC log-probs; feature extraction stays outside the graph (see OnnxBackend)."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.encoder
+        self.decoder = model.decoder
+
+    def forward(self, features, lengths):
+        encoded, encoded_len = self.encoder(audio_signal=features, length=lengths)
+        log_probs = self.decoder(encoder_output=encoded)
+        return log_probs, encoded_len
+
+def preprocessor_settings(model):
+    """Everything OnnxBackend needs to reproduce NeMo's log-mel features bit for bit."""
+    cfg = model.cfg.preprocessor
+    featurizer = model.preprocessor.featurizer
+    return {
+        'sample_rate': cfg.sample_rate,
+        'n_fft': featurizer.n_fft,
+        'hop_length': featurizer.hop_length,
+        'win_length': featurizer.win_length,
+        'preemph': featurizer.preemph,
+        'mag_power': featurizer.mag_power,
+        'log_zero_guard_value': float(featurizer.log_zero_guard_value_fn(torch.zeros(1))),
+        'normalize': cfg.get('normalize', 'per_feature'),
+        'frame_shift': featurizer.hop_length * model.encoder.subsampling_factor,
+        'blank_id': model.decoder.num_classes_with_blank - 1,
+    }
+
+def export_onnx(output_dir, example_seconds=40, opset=17):
+    from nemo.core.classes.common import typecheck
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = load_model("cpu")
+    typecheck.set_typecheck_enabled(enabled=False)
+
+    # Example input: one window of features; batch and time axes are dynamic
+    sample_rate = model.cfg.preprocessor.sample_rate
+    signal = torch.randn(1, int(example_seconds * sample_rate))
+    with torch.no_grad():
+        features, feature_len = model.preprocessor(input_signal=signal, length=torch.tensor([signal.shape[1]]))
+
+    wrapper = EncoderDecoder(model).eval()
+    onnx_path = os.path.join(output_dir, 'encoder.onnx')
+    torch.onnx.export(
+        wrapper,
+        (features, feature_len),
+        onnx_path,
+        input_names=['features', 'lengths'],
+        output_names=['log_probs', 'encoded_len'],
+        dynamic_axes={
+            'features': {0: 'batch', 2: 'time'},
+            'lengths': {0: 'batch'},
+            'log_probs': {0: 'batch', 1: 'frames'},
+            'encoded_len': {0: 'batch'},
+        },
+        opset_version=opset,
+        do_constant_folding=True,
+    )
+
+    featurizer = model.preprocessor.featurizer
+    np.savez(os.path.join(output_dir, 'preprocessor.npz'),
+             filterbank=featurizer.fb.squeeze(0).cpu().numpy(),
+             window=featurizer.window.cpu().numpy())
+    with open(os.path.join(output_dir, 'export_config.json'), 'w') as f:
+        json.dump(preprocessor_settings(model), f, indent=2)
+    with open(os.path.join(output_dir, 'vocab.json'), 'w') as f:
+        json.dump(list(model.tokenizer.vocab), f)
+
+    print(f"Exported {onnx_path}")
+    print(f"  opset {opset}, traced with {example_seconds}s of audio, dynamic batch/time axes")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the encoder + CTC head to ONNX for the onnx backend')
+    parser.add_argument('--output_dir', type=str,
+                        default=config["model"].get("onnx", {}).get("model_dir", "models/onnx"))
+    parser.add_argument('--example_seconds', type=float, default=40)
+    parser.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args()
+
+    export_onnx(args.output_dir, args.example_seconds, args.opset)
@@ -0,0 +1,55 @@
+import os
+import tarfile
+import argparse
+import tempfile
+from omegaconf import OmegaConf, open_dict
+from src.config import config
+from src.model import load_model, SNAPSHOT_CONFIG, SNAPSHOT_WEIGHTS
+
+def resolve_artifacts(node, snapshot_dir):
+    """Point ``nemo:`` artifact references (tokenizer files) at their extracted copies."""
+    if OmegaConf.is_dict(node):
+        for key in node:
+            value = node[key]
+            if isinstance(value, str) and value.startswith("nemo:"):
+                node[key] = os.path.join(snapshot_dir, value[len("nemo:"):])
+            elif OmegaConf.is_config(value):
+                resolve_artifacts(value, snapshot_dir)
+
+def export_snapshot(snapshot_dir):
+    snapshot_dir = os.path.abspath(snapshot_dir)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # load_model applies decoding and attention settings, so the saved config is already resolved
+    model = load_model("cpu")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nemo_path = os.path.join(tmp_dir, "model.nemo")
+        model.save_to(nemo_path)
+        with tarfile.open(nemo_path) as tar:
+            tar.extractall(snapshot_dir)
+
+    config_path = os.path.join(snapshot_dir, SNAPSHOT_CONFIG)
+    cfg = OmegaConf.load(config_path)
+    with open_dict(cfg):
+        resolve_artifacts(cfg, snapshot_dir)
+        if "tokenizer" in cfg:
+            cfg.tokenizer.dir = snapshot_dir
+        # No dataloaders at serving time
+        for ds in ("train_ds", "validation_ds", "test_ds"):
+            cfg[ds] = None
+    OmegaConf.save(cfg, config_path)
+
+    print(f"Snapshot written to {snapshot_dir}")
+    print(f"  {SNAPSHOT_CONFIG}, {SNAPSHOT_WEIGHTS} and tokenizer files")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export a pre-extracted model snapshot for fast cold starts')
+    parser.add_argument('--snapshot_dir', type=str, default=config["model"].get("snapshot_dir"),
+                        help='Where to write the snapshot (default: model.snapshot_dir in config.yml)')
+    args = parser.parse_args()
+
+    if not args.snapshot_dir:
+        raise ValueError("No snapshot_dir given and model.snapshot_dir is not set in config.yml")
+
+    export_snapshot(args.snapshot_dir)
@@ -0,0 +1,76 @@
+import sys
+import json
+import argparse
+import soundfile as sf
+import torch
+from src.backends import create_backend
+from src.evaluation import build_index, sample_entries
+
+def pad(audios):
+    lengths = torch.tensor([len(a) for a in audios], dtype=torch.long)
+    signal = torch.zeros(len(audios), int(lengths.max()))
+    for i, audio in enumerate(audios):
+        signal[i, :len(audio)] = torch.as_tensor(audio)
+    return signal, lengths
+
+def compare(reference, candidate, audios):
+    """Max feature / log-prob differences and greedy agreement for one padded batch."""
+    signal, lengths = pad(audios)
+    with torch.no_grad():
+        ref_features, ref_feature_len = reference.model.preprocessor(input_signal=signal, length=lengths)
+        features, feature_len = candidate.featurizer(signal, lengths)
+        ref_log_probs, ref_len, ref_preds = reference.forward(signal, lengths)
+        log_probs, encoded_len, preds = candidate.forward(signal, lengths)
+
+    assert torch.equal(ref_feature_len.cpu(), feature_len), "feature lengths differ"
+    assert torch.equal(ref_len.cpu(), encoded_len), "encoded lengths differ"
+    result = {'feature_max_diff': 0.0, 'log_prob_max_diff': 0.0, 'frames': 0, 'frames_equal': 0}
+    for i in range(len(audios)):
+        n, t = int(feature_len[i]), int(encoded_len[i])
+        result['feature_max_diff'] = max(result['feature_max_diff'],
+                                         float((ref_features[i, :, :n].cpu() - features[i, :, :n]).abs().max()))
+        result['log_prob_max_diff'] = max(result['log_prob_max_diff'],
+                                          float((ref_log_probs[i, :t].cpu() - log_probs[i, :t]).abs().max()))
+        result['frames'] += t
+        result['frames_equal'] += int((ref_preds[i, :t].cpu() == preds[i, :t]).sum())
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the onnx backend against NeMo on the same audio')
+    parser.add_argument('--dataset_path', type=str, default='LibriSpeech/test-clean')
+    parser.add_argument('--num_files', type=int, default=50)
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--max_log_prob_diff', type=float, default=1e-2)
+    parser.add_argument('--min_frame_agreement', type=float, default=0.999)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    entries = sample_entries(build_index(args.dataset_path), args.num_files, args.seed)
+    # Similar lengths per batch keep padding, and the padding's effect on the encoder, realistic
+    audios = [sf.read(e['path'], dtype='float32')[0] for e in sorted(entries, key=lambda e: e['duration'])]
+
+    reference = create_backend('cpu', 'fp32', name='nemo')
+    candidate = create_backend('cpu', 'fp32', name='onnx')
+
+    totals = {'feature_max_diff': 0.0, 'log_prob_max_diff': 0.0, 'frames': 0, 'frames_equal': 0}
+    for i in range(0, len(audios), args.batch_size):
+        result = compare(reference, candidate, audios[i:i + args.batch_size])
+        for key in ('feature_max_diff', 'log_prob_max_diff'):
+            totals[key] = max(totals[key], result[key])
+        totals['frames'] += result['frames']
+        totals['frames_equal'] += result['frames_equal']
+
+    texts_ref = reference.transcribe(audios, batch_size=args.batch_size)
+    texts = candidate.transcribe(audios, batch_size=args.batch_size)
+    totals['frame_agreement'] = totals['frames_equal'] / max(totals['frames'], 1)
+    totals['transcripts_equal'] = sum(a == b for a, b in zip(texts_ref, texts))
+    totals['files'] = len(audios)
+    totals['passed'] = totals['log_prob_max_diff'] <= args.max_log_prob_diff \
+        and totals['frame_agreement'] >= args.min_frame_agreement
+
+    print(json.dumps(totals, indent=2))
+    for a, b in zip(texts_ref, texts):
+        if a != b:
+            print(f"nemo: {a}\nonnx: {b}\n")
+    if not totals['passed']:
+        sys.exit(1)
@@ -0,0 +1,56 @@
+import json
+import argparse
+from tqdm import tqdm
+from src.config import config
+from src.model import replica_devices
+from src.profiling import SETTING_KEYS, choose_settings, fit_memory_seed, sweep, write_results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Sweep model and batching settings over clip durations (CUDA or CPU)')
+    parser.add_argument('--device', type=str, default=None, help='Default: the first model pool device')
+    parser.add_argument('--backend', type=str, default=None, help='Default: model.backend in config.yml')
+    parser.add_argument('--attention_contexts', type=int, nargs='+', default=[128, 256],
+                        help='Local attention span (frames each side)')
+    parser.add_argument('--subsampling_factors', type=int, nargs='+', default=[1],
+                        help='Subsampling conv chunking factor (1 = auto)')
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--window_seconds', type=float, nargs='+', default=[20, 40, 60],
+                        help='Chunk length for audio longer than one window')
+    parser.add_argument('--precisions', type=str, nargs='+', default=[config.get('precision', 'fp32')])
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 30, 300, 1800],
+                        help='Clip durations (s) each setting is measured on')
+    parser.add_argument('--overlap_seconds', type=float, default=None, help='Default: chunking.overlap_seconds')
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--trace_dir', type=str, default=None,
+                        help='Also write a torch.profiler Chrome trace per measurement here')
+    parser.add_argument('--output', type=str, default=config.get('profiling', {}).get('results_path', 'profiles/sweep.json'),
+                        help='Results table; the server loads it from profiling.results_path')
+    args = parser.parse_args()
+
+    device = args.device or replica_devices()[0]
+    backend_name = args.backend or config['model'].get('backend', 'nemo')
+    grid = {'attention_context': args.attention_contexts, 'subsampling_factor': args.subsampling_factors,
+            'batch_size': args.batch_sizes, 'window_seconds': args.window_seconds, 'precision': args.precisions}
+    total = len(args.durations)
+    for key in SETTING_KEYS:
+        total *= len(grid[key])
+
+    rows = []
+    for row in tqdm(sweep(device, grid, args.durations, backend_name, args.overlap_seconds, args.repeats,
+                          args.trace_dir), total=total, desc="Profiling"):
+        rows.append(row)
+        write_results(args.output, rows, device, backend_name)  # keep partial results if the sweep dies
+
+    print(f"\n{'ctx':>5}{'sub':>5}{'batch':>7}{'window':>8}{'precision':>14}{'duration':>10}{'RTF':>10}{'peak MB':>10}")
+    for r in sorted(rows, key=lambda r: (r['duration'], r.get('rtf') or float('inf'))):
+        result = f"{r['rtf']:>10.4f}{r['peak_mb']:>10.0f}" if not r['error'] else f"{r['error']:>20}"
+        print(f"{r['attention_context']:>5}{r['subsampling_factor']:>5}{r['batch_size']:>7}{r['window_seconds']:>8g}"
+              f"{r['precision']:>14}{r['duration']:>10g}{result}")
+
+    max_peak_mb = config.get('memory', {}).get('vram_ceiling_mb') if device.startswith('cuda') else None
+    for precision in args.precisions:
+        print(f"Chosen at {precision}: {json.dumps(choose_settings(rows, precision, max_peak_mb))}")
+    seed = fit_memory_seed(rows)
+    if seed:
+        print(f"Memory seed for config.yml: seed_static_mb: {seed[0]:.0f}, seed_mb_per_second: {seed[1]:.2f}")
+    print(f"Results saved to {args.output}")
@@ -1,113 +1,54 @@
-#from src.AudioProcessor import AudioProcessor
-#from src.model import model  # Assuming this is how your model is imported
-#
-## For production
-##processor = AudioProcessor(model, batch_size=8)
-##transcriptions = processor.process_files('path/to/audio/files')
-#
-## For evaluation
-#eval_processor = AudioProcessor(model, batch_size=8, eval_mode=True)
-#eval_transcriptions = eval_processor.process_files('LibriSpeech/test-clean')
-import os
-import glob
-from src.inference import transcribe_audio
-import jiwer
-import time
+import json
+import argparse
 from tqdm import tqdm
-import soundfile as sf
+from src.config import config
+from src.evaluation import build_index, evaluate
+from src.model import replica_devices
 
-def process_librispeech(root_dir='LibriSpeech/test-clean'):
-    all_ground_truths = []
-    all_transcriptions = []
-    total_audio_duration = 0
-    total_transcription_time = 0
-    file_count = 0
-    start_time = time.time()
-
-    #for speaker_dir in glob.glob(os.path.join(root_dir, '*'))[:1]:
-    for speaker_dir in glob.glob(os.path.join(root_dir, '*')):
-        for chapter_dir in glob.glob(os.path.join(speaker_dir, '*')):
-            # Read the ground truth transcriptions
-            trans_file = os.path.join(chapter_dir, f'{os.path.basename(chapter_dir.split("/")[-2] + "-" + chapter_dir.split("/")[-1])}.trans.txt')
-            print(trans_file)
-            with open(trans_file, 'r') as f:
-                ground_truth = {line.split()[0]: ' '.join(line.split()[1:]) for line in f}
-            
-            # Process each audio file
-            for audio_file in glob.glob(os.path.join(chapter_dir, '*.flac')):
-                file_id = os.path.splitext(os.path.basename(audio_file))[0]
-
-#                real_start_time = time.time()
-                
-                # Get audio duration
-                audio_info = sf.info(audio_file)
-                audio_duration = audio_info.duration
-                total_audio_duration += audio_duration
-
-                # Read audio file
-                with open(audio_file, 'rb') as f:
-                    audio_data = f.read()
-                
-                # Transcribe audio
-                transcription_start = time.time()
-                transcription = transcribe_audio(audio_data)
-                transcription_end = time.time()
-
-#                real_end_time = time.time()
-                
-                transcription_time = transcription_end - transcription_start
-#                real_time = real_end_time - real_start_time
-
-                total_transcription_time += transcription_time
-#                total_real_time += real_time
-
-                file_count += 1
-
-#                rtf_net = transcription_time / audio_duration
-#                rtf_real = real_time / audio_duration
-
-                # Compare with ground truth
-#               print(f'File: {file_id}')
-#               print(f'Ground Truth: {ground_truth[file_id].lower()}')
-#               print(f'Transcription: {transcription}')
-#               print(f'Audio Duration: {audio_duration:.2f} seconds')
-#               print(f'Transcription Time: {transcription_time:.4f} seconds')
-#               print(f'RTF: {rtf:.4f}')
-#               print('---')
-#                print('---')
-                all_ground_truths.append(ground_truth[file_id].lower())
-                all_transcriptions.append(transcription)
-
-    end_time = time.time()
-    total_time = end_time - start_time
-
-    # Calculate WER for all transcriptions
-    wer = jiwer.wer(all_ground_truths, all_transcriptions)
-
-    # Calculate overall RTF
-    #overall_rtf = total_transcription_time / total_audio_duration
-    overall_rtf_net = total_transcription_time / total_audio_duration
-    overall_rtf_real = total_time / total_audio_duration
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sharded, batched WER/RTF evaluation on LibriSpeech')
+    parser.add_argument('--dataset_path', type=str, default='LibriSpeech/test-clean')
+    parser.add_argument('--index', type=str, default=None,
+                        help='Persisted utterance index (default: <dataset_path>.index.jsonl)')
+    parser.add_argument('--rebuild_index', action='store_true')
+    parser.add_argument('--devices', type=str, nargs='+', default=None,
+                        help='One worker process per entry, e.g. cuda:0 cuda:1 or cpu cpu (default: the model pool devices)')
+    parser.add_argument('--precision', type=str, default=None, help='Default: precision in config.yml')
+    parser.add_argument('--max_batch_seconds', type=float, default=600.0,
+                        help='Padded audio seconds per batch (default: 600)')
+    parser.add_argument('--loader_workers', type=int, default=2, help='Audio decode workers per shard')
+    parser.add_argument('--audio_cache', type=str, default=None,
+                        help='Pre-decoded audio from tools/build_audio_cache.py, read through np.memmap')
+    parser.add_argument('--limit', type=int, default=None, help='Only the first N utterances of the index')
+    parser.add_argument('--output', type=str, default='eval_results.json')
+    args = parser.parse_args()
+
+    entries = build_index(args.dataset_path, args.index, args.rebuild_index)[:args.limit]
+    devices = args.devices or replica_devices()
+    print(f"{len(entries)} utterances, {sum(e['duration'] for e in entries):.1f}s of audio, devices {devices}")
+
+    pbar = tqdm(total=len(entries))
+    def progress(count, wer):
+        pbar.update(count)
+        pbar.set_postfix(wer=f"{wer:.4f}")
+
+    results = evaluate(entries, devices, args.precision or config.get('precision', 'fp32'),
+                       args.max_batch_seconds, args.loader_workers, progress, args.audio_cache)
+    pbar.close()
 
     print("\nPerformance Metrics:")
-    print(f'Total Execution Time: {total_time:.2f} seconds')
-    print(f'Total Audio Duration: {total_audio_duration:.2f} seconds')
-    print(f'Total Net Transcription Time: {total_transcription_time:.2f} seconds')
-    print(f'Average Net Transcription Time per File: {total_transcription_time/file_count:.4f} seconds')
-    print(f'Average Real Processing Time per File: {total_time/file_count:.4f} seconds')
-    print(f'Files Processed: {file_count}')
-    print(f'Overall Net RTF: {overall_rtf_net:.4f}')
-    print(f'Overall Real RTF: {overall_rtf_real:.4f}')
-    print(f'Overall WER: {wer:.4f}')
-
-#    print("\nPerformance Metrics:")
-#    print(f'Total Execution Time: {total_time:.2f} seconds')
-#    print(f'Total Audio Duration: {total_audio_duration:.2f} seconds')
-#    print(f'Total Transcription Time: {total_transcription_time:.2f} seconds')
-#    print(f'Average Transcription Time per File: {total_transcription_time/file_count:.4f} seconds')
-#    print(f'Files Processed: {file_count}')
-#    print(f'Overall RTF: {overall_rtf:.4f}')
-#    print(f'Overall WER: {wer:.4f}')
-
-if __name__ == '__main__':
-    process_librispeech()
+    print(f"Total Execution Time: {results['wall_time']:.2f} seconds")
+    print(f"Total Audio Duration: {results['audio_seconds']:.2f} seconds")
+    print(f"Files Processed: {results['utterances']}")
+    print(f"Overall Real RTF: {results['rtf']:.4f}")
+    print(f"Inference RTF (slowest shard): {results['inference_rtf']:.4f}")
+    print(f"Overall WER: {results['wer']:.4f}")
+    print("\nWER by duration:")
+    for bucket, row in results['per_duration'].items():
+        print(f"  {bucket:>8}: {row['wer']:.4f} ({row['utterances']} utterances)")
+    worst = sorted(results['per_speaker'].items(), key=lambda kv: kv[1]['wer'], reverse=True)[:5]
+    print("Highest-WER speakers: " + ", ".join(f"{speaker} {row['wer']:.4f}" for speaker, row in worst))
+
+    with open(args.output, 'w') as f:
+        json.dump(results | {'config': vars(args)}, f, indent=2)
+    print(f"Results saved to {args.output}")
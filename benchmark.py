@@ -2,94 +2,125 @@ import os
 import json
 import time
 import random
+import asyncio
 import argparse
-import requests
+import aiohttp
+import numpy as np
 from jiwer import wer
-from pydub import AudioSegment
 from tqdm import tqdm
+from utterance_index import load_index, sample_entries
 
-def load_transcriptions(trans_file):
-    transcriptions = {}
-    with open(trans_file, 'r') as f:
-        for line in f:
-            parts = line.strip().split(' ', 1)
-            if len(parts) == 2:
-                file_id, text = parts
-                transcriptions[file_id] = text
-    return transcriptions
-
-def transcribe_file(file_path, worker_url):
-    with open(file_path, 'rb') as f:
-        files = {'file': f}
-        response = requests.post(worker_url, files=files)
-    return response.json()['transcription'] if response.status_code == 200 else None
-
-def get_audio_duration(file_path):
-    audio = AudioSegment.from_file(file_path, format="flac")
-    return len(audio) / 1000.0  # Convert milliseconds to seconds
-
-def benchmark_dataset(dataset_path, worker_url, percentage):
-    all_flac_files = []
-    for root, _, files in os.walk(dataset_path):
-        all_flac_files.extend([os.path.join(root, f) for f in files if f.endswith('.flac')])
-    
-    # Randomly select a percentage of files
-    num_files_to_test = max(1, int(len(all_flac_files) * percentage / 100))
-    files_to_test = random.sample(all_flac_files, num_files_to_test)
-    
+def build_index(dataset_path, percentage, seed=None):
+    """Pick the files to test and precompute everything the timed loop needs.
+
+    Paths, references and durations come from the persisted utterance index (see
+    utterance_index.py), and the audio bytes are read up front so disk I/O doesn't
+    show up in request latency.
+    """
+    entries = load_index(dataset_path)
+    num_files_to_test = max(1, int(len(entries) * percentage / 100))
+
+    index = []
+    for entry in sample_entries(entries, num_files_to_test, seed):
+        with open(entry['path'], 'rb') as f:
+            data = f.read()
+        index.append({
+            'file': os.path.basename(entry['path']),
+            'data': data,
+            'reference': entry['reference'],
+            'audio_duration': entry['duration'],
+        })
+    return index, len(entries)
+
+async def transcribe_file(session, worker_url, item):
+    form = aiohttp.FormData()
+    form.add_field('file', item['data'], filename=item['file'])
+    start_time = time.perf_counter()
+    async with session.post(worker_url, data=form) as response:
+        body = await response.json() if response.status == 200 else None
+    end_time = time.perf_counter()
+    hypothesis = body['transcription'] if body else None
+    return hypothesis, end_time - start_time, response.status
+
+async def run_load(index, worker_url, concurrency, rate, seed=None):
+    """Closed loop with ``concurrency`` clients, or open loop with Poisson arrivals at ``rate`` req/s.
+
+    In open-loop mode ``concurrency`` caps the requests in flight so an overloaded server
+    shows up as queueing latency rather than unbounded client memory.
+    """
     results = []
-    total_time = 0
-    total_audio_duration = 0
-    
-    # Create a progress bar
-    pbar = tqdm(total=len(files_to_test), desc="Processing files")
-    
-    for file_path in files_to_test:
-        file = os.path.basename(file_path)
-        file_id = os.path.splitext(file)[0]
-        
-        start_time = time.time()
-        hypothesis = transcribe_file(file_path, worker_url)
-        end_time = time.time()
-        
-        if hypothesis is not None:
-            trans_file = os.path.join(os.path.dirname(file_path), f"{file_id.rsplit('-', 1)[0]}.trans.txt")
-            reference_transcriptions = load_transcriptions(trans_file)
-            reference = reference_transcriptions.get(file_id, '').lower()
-            error_rate = wer(reference, hypothesis.lower())
-            
-            processing_time = end_time - start_time
-            total_time += processing_time
-            
-            audio_duration = get_audio_duration(file_path)
-            total_audio_duration += audio_duration
-            
+    pbar = tqdm(total=len(index), desc="Processing files")
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=None)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(item, scheduled_at):
+            async with semaphore:
+                try:
+                    hypothesis, latency, status = await transcribe_file(session, worker_url, item)
+                except aiohttp.ClientError as e:
+                    hypothesis, latency, status = None, 0.0, str(e)
+            # Open loop: latency counts from the scheduled arrival, including client-side queueing
+            total_latency = time.perf_counter() - scheduled_at
             results.append({
-                'file': file,
-                'reference': reference,
+                'file': item['file'],
+                'reference': item['reference'],
                 'hypothesis': hypothesis,
-                'wer': error_rate,
-                'processing_time': processing_time,
-                'audio_duration': audio_duration
+                'status': status,
+                'latency': total_latency if rate else latency,
+                'service_time': latency,
+                'audio_duration': item['audio_duration'],
             })
-        
-        # Update the progress bar
-        pbar.update(1)
-    
-    # Close the progress bar
+            pbar.update(1)
+
+        start_time = time.perf_counter()
+        if rate:
+            rng = random.Random(seed)
+            tasks = []
+            next_arrival = time.perf_counter()
+            for item in index:
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(one(item, next_arrival)))
+                next_arrival += rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+        else:
+            queue = asyncio.Queue()
+            for item in index:
+                queue.put_nowait(item)
+
+            async def client():
+                while not queue.empty():
+                    await one(queue.get_nowait(), time.perf_counter())
+
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+        wall_time = time.perf_counter() - start_time
+
     pbar.close()
-    
-    avg_wer = sum(r['wer'] for r in results) / len(results) if results else 0
-    rtf = total_time / total_audio_duration if total_audio_duration > 0 else 0
-    
+    return results, wall_time
+
+def summarize(results, wall_time, total_files):
+    ok = [r for r in results if r['hypothesis'] is not None]
+    latencies = np.array([r['latency'] for r in ok]) if ok else np.zeros(1)
+    total_audio_duration = sum(r['audio_duration'] for r in ok)
+
     return {
-        'results': results,
-        'average_wer': avg_wer,
-        'total_time': total_time,
+        'files_tested': len(results),
+        'total_files': total_files,
+        'errors': len(results) - len(ok),
+        'wer': wer([r['reference'] for r in ok], [r['hypothesis'].lower() for r in ok]) if ok else None,
+        'latency_p50': float(np.percentile(latencies, 50)),
+        'latency_p95': float(np.percentile(latencies, 95)),
+        'latency_p99': float(np.percentile(latencies, 99)),
+        'latency_mean': float(latencies.mean()),
+        'wall_time': wall_time,
         'total_audio_duration': total_audio_duration,
-        'rtf': rtf,
-        'files_tested': len(files_to_test),
-        'total_files': len(all_flac_files)
+        'requests_per_second': len(ok) / wall_time if wall_time > 0 else 0,
+        'audio_hours_per_hour': total_audio_duration / wall_time if wall_time > 0 else 0,
+        'rtf': wall_time / total_audio_duration if total_audio_duration > 0 else 0,
     }
 
 if __name__ == '__main__':
@@ -98,26 +129,46 @@ if __name__ == '__main__':
                         help='Path to the LibriSpeech dataset')
     parser.add_argument('--percentage', type=float, default=100.0,
                         help='Percentage of the dataset to test (default: 100.0)')
+    parser.add_argument('--url', type=str, default=None,
+                        help='Transcribe endpoint (default: http://$AWS_IP:8000/transcribe)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Concurrent clients (closed loop), or max in flight with --rate')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Open-loop Poisson arrival rate in requests/second')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for file selection and arrivals')
+    parser.add_argument('--output', type=str, default='benchmark_results.json',
+                        help='Where to save the JSON results')
     args = parser.parse_args()
 
-    aws_ip = os.environ.get('AWS_IP')
-    if not aws_ip:
-        raise ValueError("AWS_IP environment variable is not set")
-    
-    worker_url = f'http://{aws_ip}:8000/transcribe'
-    
+    worker_url = args.url
+    if worker_url is None:
+        aws_ip = os.environ.get('AWS_IP')
+        if not aws_ip:
+            raise ValueError("AWS_IP environment variable is not set and no --url given")
+        worker_url = f'http://{aws_ip}:8000/transcribe'
+
     print(f"Worker URL: {worker_url}")
     print(f"Dataset path: {args.dataset_path}")
     print(f"Testing {args.percentage}% of the dataset")
-    
-    benchmark_results = benchmark_dataset(args.dataset_path, worker_url, args.percentage)
-    
-    print(f"\nFiles tested: {benchmark_results['files_tested']} out of {benchmark_results['total_files']}")
-    print(f"Average WER: {benchmark_results['average_wer']:.4f}")
-    print(f"Total processing time: {benchmark_results['total_time']:.2f} seconds")
-    print(f"Total audio duration: {benchmark_results['total_audio_duration']:.2f} seconds")
-    print(f"Real-time factor: {benchmark_results['rtf']:.4f}")
-    
+    print(f"Load: {f'{args.rate} req/s Poisson' if args.rate else 'closed loop'}, concurrency {args.concurrency}")
+
+    index, total_files = build_index(args.dataset_path, args.percentage, args.seed)
+    results, wall_time = asyncio.run(run_load(index, worker_url, args.concurrency, args.rate, args.seed))
+    summary = summarize(results, wall_time, total_files)
+
+    print(f"\nFiles tested: {summary['files_tested']} out of {summary['total_files']} ({summary['errors']} errors)")
+    print(f"WER: {summary['wer']:.4f}" if summary['wer'] is not None else "WER: n/a")
+    print(f"Latency p50/p95/p99: {summary['latency_p50']:.3f}s / {summary['latency_p95']:.3f}s / {summary['latency_p99']:.3f}s")
+    print(f"Wall time: {summary['wall_time']:.2f} seconds")
+    print(f"Total audio duration: {summary['total_audio_duration']:.2f} seconds")
+    print(f"Throughput: {summary['audio_hours_per_hour']:.1f} audio-hours/hour, {summary['requests_per_second']:.2f} req/s")
+    print(f"Real-time factor: {summary['rtf']:.4f}")
+
     # Save detailed results to a file
-#    with open('benchmark_results.json', 'w') as f:
-#        json.dump(benchmark_results, f, indent=2)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'config': {k: v for k, v in vars(args).items()} | {'url': worker_url},
+            'summary': summary,
+            'results': results,
+        }, f, indent=2)
+    print(f"Results saved to {args.output}")
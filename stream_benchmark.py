@@ -0,0 +1,144 @@
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+import numpy as np
+import soundfile as sf
+from jiwer import wer
+from utterance_index import load_index, sample_entries
+
+def load_clips(dataset_path, count, seed=None):
+    """``count`` random LibriSpeech utterances as (file id, int16 PCM bytes, duration, reference)."""
+    clips = []
+    for entry in sample_entries(load_index(dataset_path), count, seed):
+        audio, rate = sf.read(entry['path'], dtype='int16')
+        assert rate == 16000, f"{entry['path']}: realtime streams are 16 kHz"
+        clips.append((entry['id'], audio.tobytes(), len(audio) / rate, entry['reference']))
+    return clips
+
+async def run_stream(session, url, clip, chunk_ms, speed):
+    """Send one clip paced like a live microphone and time what comes back.
+
+    lag: audio sent so far minus the end of the window a partial was decoded from.
+    first_token: seconds from the first audio sent until a partial with any text.
+    final_latency: seconds from the end of the audio until the server's ``done``.
+    """
+    file_id, pcm, duration, reference = clip
+    chunk_bytes = int(16000 * chunk_ms / 1000) * 2
+    stats = {'file': file_id, 'duration': duration, 'reference': reference, 'lags': [],
+             'first_token': None, 'final_latency': None, 'finals': [], 'error': None}
+
+    async with session.ws_connect(url, max_msg_size=0) as ws:
+        start = time.perf_counter()
+        sent_seconds = 0.0
+
+        async def receive():
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                data = json.loads(msg.data)
+                now = time.perf_counter()
+                if data['type'] == 'partial':
+                    stats['lags'].append(max(0.0, sent_seconds - data['audio_seconds']))
+                    if data['text'] and stats['first_token'] is None:
+                        stats['first_token'] = now - start
+                elif data['type'] == 'final':
+                    stats['finals'].append(data['text'])
+                    if stats['first_token'] is None:
+                        stats['first_token'] = now - start
+                elif data['type'] == 'done':
+                    return now
+
+        receiver = asyncio.create_task(receive())
+        for offset in range(0, len(pcm), chunk_bytes):
+            await ws.send_bytes(pcm[offset:offset + chunk_bytes])
+            sent_seconds = min(duration, (offset + chunk_bytes) / 32000)
+            delay = start + sent_seconds / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        end_sent = time.perf_counter()
+        await ws.send_str(json.dumps({'type': 'end'}))
+        done_at = await receiver
+        if done_at is None:
+            stats['error'] = f'closed early: {ws.close_code}'
+        else:
+            stats['final_latency'] = done_at - end_sent
+    stats['hypothesis'] = ' '.join(t for t in stats['finals'] if t).lower()
+    return stats
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+async def run_level(url, clips, streams, chunk_ms, speed):
+    """``streams`` concurrent sessions, each streaming clips back to back."""
+    timeout = aiohttp.ClientTimeout(total=None)
+    queue = asyncio.Queue()
+    for clip in clips:
+        queue.put_nowait(clip)
+    results = []
+
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async def client():
+            while not queue.empty():
+                clip = queue.get_nowait()
+                try:
+                    results.append(await run_stream(session, url, clip, chunk_ms, speed))
+                except aiohttp.ClientError as e:
+                    results.append({'file': clip[0], 'error': str(e)})
+
+        await asyncio.gather(*(client() for _ in range(streams)))
+
+    ok = [r for r in results if not r.get('error')]
+    lags = [lag for r in ok for lag in r['lags']]
+    first = [r['first_token'] for r in ok if r['first_token'] is not None]
+    finals = [r['final_latency'] for r in ok]
+    refs = [r['reference'] for r in ok if r['reference']]
+    return {
+        'streams': streams,
+        'sessions': len(results),
+        'errors': len(results) - len(ok),
+        'lag_p50': percentile(lags, 50),
+        'lag_p95': percentile(lags, 95),
+        'first_token_p50': percentile(first, 50),
+        'first_token_p95': percentile(first, 95),
+        'final_latency_p50': percentile(finals, 50),
+        'final_latency_p95': percentile(finals, 95),
+        'wer': wer(refs, [r['hypothesis'] for r in ok if r['reference']]) if refs else None,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test the realtime WebSocket endpoint with concurrent live streams')
+    parser.add_argument('--dataset_path', type=str, default='../data/LibriSpeech/test-clean')
+    parser.add_argument('--url', type=str, default='ws://localhost:8000/transcribe/realtime')
+    parser.add_argument('--streams', type=int, nargs='+', default=[1, 4, 8, 16, 32],
+                        help='Concurrency levels to sweep')
+    parser.add_argument('--clips_per_stream', type=int, default=3)
+    parser.add_argument('--chunk_ms', type=float, default=100, help='Audio per WebSocket message')
+    parser.add_argument('--speed', type=float, default=1.0, help='Send rate relative to real time')
+    parser.add_argument('--max_lag', type=float, default=2.0,
+                        help='p95 lag (s) a level must stay under to count as sustained')
+    parser.add_argument('--gpus', type=int, default=1, help='GPUs behind the server, for streams per GPU')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', type=str, default='stream_benchmark_results.json')
+    args = parser.parse_args()
+
+    levels = []
+    for streams in args.streams:
+        clips = load_clips(args.dataset_path, streams * args.clips_per_stream, args.seed)
+        level = asyncio.run(run_level(args.url, clips, streams, args.chunk_ms, args.speed))
+        levels.append(level)
+        print(f"{streams:>4} streams: lag p50/p95 {level['lag_p50'] or 0:.2f}/{level['lag_p95'] or 0:.2f}s, "
+              f"first token p50 {level['first_token_p50'] or 0:.2f}s, "
+              f"final p95 {level['final_latency_p95'] or 0:.2f}s, errors {level['errors']}"
+              + (f", WER {level['wer']:.4f}" if level['wer'] is not None else ""))
+
+    sustained = [l['streams'] for l in levels
+                 if l['errors'] == 0 and l['lag_p95'] is not None and l['lag_p95'] <= args.max_lag]
+    capacity = max(sustained) if sustained else 0
+    print(f"\nSustained streams (p95 lag <= {args.max_lag}s): {capacity} ({capacity / args.gpus:.1f} per GPU)")
+
+    with open(args.output, 'w') as f:
+        json.dump({'config': vars(args), 'levels': levels, 'sustained_streams': capacity,
+                   'streams_per_gpu': capacity / args.gpus}, f, indent=2)
+    print(f"Results saved to {args.output}")
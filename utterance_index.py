@@ -0,0 +1,24 @@
+import os
+import json
+import random
+
+def default_index_path(dataset_path):
+    """Where app/src/evaluation.py persists the utterance index, e.g. LibriSpeech/test-clean.index.jsonl."""
+    return os.path.normpath(dataset_path) + '.index.jsonl'
+
+def load_index(dataset_path, index_path=None):
+    """Utterances (id, path, speaker, chapter, duration, reference) from the persisted index.
+
+    The benchmarks only read it, so they run on machines without the server's dependencies;
+    ``python -m tools.build_index`` (from ``app/``) writes it.
+    """
+    index_path = index_path or default_index_path(dataset_path)
+    if not os.path.isfile(index_path):
+        raise SystemExit(f"No utterance index at {index_path}; build it with "
+                         f"`python -m tools.build_index --dataset_path {dataset_path}` from app/")
+    with open(index_path, 'r') as f:
+        return [json.loads(line) for line in f]
+
+def sample_entries(entries, count, seed=None):
+    """A random subset of ``count`` entries (all of them if there are fewer), reproducible per seed."""
+    return random.Random(seed).sample(entries, min(count, len(entries)))